@@ -2,4 +2,173 @@ import os
 
 MAIL_DIRECTORY = "~/Library/Mail/V10/MailData/Envelope Index"
 
+# Envelope Index를 여는 방식
+# - "ro" : 읽기 전용 (Mail.app과 공유 잠금만 사용)
+# - "immutable" : 잠금 없이 읽기 (가장 빠르지만 Mail.app이 쓰는 중이면 일관되지 않을 수 있음)
+# - "snapshot" : 백업 API로 복사본을 만든 뒤 immutable로 읽기
+MAIL_DB_MODE = os.getenv("MAIL_DB_MODE", "ro")
+
+# 가져올 메일의 발신자 / 메일함(mailboxes.url에 포함되는 문자열). 비어 있으면 거르지 않음
+MAIL_SENDERS = [s for s in os.getenv("MAIL_SENDERS", "noreply@postech.ac.kr").split(",") if s]
+MAIL_MAILBOXES = [s for s in os.getenv("MAIL_MAILBOXES", "").split(",") if s]
+
+# 메일 필터 (src/mail_filter.py의 MailFilter 필드). MAIL_FILTER_PATH에 JSON 파일이 있으면 그 설정을 대신 사용
+MAIL_FILTER = {
+    "senders": MAIL_SENDERS,
+    "mailboxes": MAIL_MAILBOXES,
+}
+
+# .emlx 원본 메일이 저장된 Apple Mail 최상위 디렉토리
+MAIL_ROOT_DIRECTORY = "~/Library/Mail/V10"
+
 POSTECH_MAIL_DIRECTORY = os.getenv("POSTECH_MAIL_DIRECTORY")
+
+# LLM 추출 결과 캐시 등 로컬 상태를 저장하는 디렉토리
+CACHE_DIRECTORY = os.path.expanduser(os.getenv("POSPLEXITY_CACHE_DIRECTORY", "~/.posplexity"))
+MAIL_FILTER_PATH = os.path.expanduser(os.getenv("MAIL_FILTER_PATH", os.path.join(CACHE_DIRECTORY, "mail_filter.json")))
+
+# LLM provider 설정 (기본 모델, 임베딩 모델, API 키 환경변수, provider별 최대 동시 요청 수, 분당 요청/토큰 한도)
+LLM_PROVIDERS = {
+    "gemini": {
+        "model": "gemini-2.0-flash",
+        "embedding_model": "text-embedding-004",
+        "api_key_env": "GEMINI_API_KEY",
+        "max_concurrency": int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+        "requests_per_minute": int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "2000")),
+        "tokens_per_minute": int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "4000000")),
+    },
+    "gpt": {
+        "model": "gpt-4o-mini",
+        "embedding_model": "text-embedding-3-small",
+        "api_key_env": "OPENAI_API_KEY",
+        "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+        "requests_per_minute": int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+        "tokens_per_minute": int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000")),
+    },
+    "deepseek": {
+        "model": "deepseek-chat",
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "base_url": "https://api.deepseek.com/v1",
+        "max_concurrency": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8")),
+        # DeepSeek은 고정된 rate limit이 없음
+        "requests_per_minute": None,
+        "tokens_per_minute": None,
+    },
+}
+
+# OpenAI 호환 provider가 공유하는 HTTP 커넥션 풀 크기
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "32"))
+
+# 이 시간(초) 안에 응답이 없으면 다음 provider로 넘어감
+LLM_FAILOVER_TIMEOUT = float(os.getenv("LLM_FAILOVER_TIMEOUT", "60"))
+
+# provider 내 재시도 횟수와 circuit breaker 설정
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30"))
+
+# 모델별 단가 (USD / 1M tokens, (input, output))
+LLM_PRICING = {
+    "gemini-2.0-flash": (0.1, 0.4),
+    "gpt-4o-mini": (0.15, 0.6),
+    "deepseek-chat": (0.27, 1.1),
+}
+USD_TO_KRW = float(os.getenv("USD_TO_KRW", "1500"))
+
+# 실행 리포트(JSON) / Prometheus 메트릭 저장 위치
+METRICS_DIRECTORY = os.path.join(CACHE_DIRECTORY, "metrics")
+
+# LLM에 전달하는 메일 본문의 최대 토큰 수와 초과 시 자르는 방식 ("head" : 앞부분만 / "head_tail" : 앞뒤를 남기고 가운데 생략)
+MAIL_TOKEN_BUDGET = int(os.getenv("MAIL_TOKEN_BUDGET", "1500"))
+MAIL_TRUNCATION_POLICY = os.getenv("MAIL_TRUNCATION_POLICY", "head_tail")
+
+# 모든 공지(noreply@postech.ac.kr 등)에 반복되는 머리말/꼬리말 줄 패턴 (줄 전체가 일치할 때만 그 줄을 제거)
+MAIL_BOILERPLATE_PATTERNS = [
+    r"^Copyright\b.*$",
+    r"^[ⓒ©].*$",
+    r"^\(?\d{5}\)?\s*경상북도 포항시 남구 청암로 77.*$",
+    r"^\d{5}\s*77 Cheongam-Ro.*$",
+]
+# 본문 끝에 붙는 안내 문장 패턴 (그 문장만 제거하고, 같은 줄의 나머지 내용은 남김)
+# 요약(summary)은 한 줄인 경우가 많아 줄 전체를 지우면 공지 내용까지 사라짐
+MAIL_BOILERPLATE_SENTENCE_PATTERNS = [
+    r"[본이] 메일은 발신 전용[^.!?。]*[.!?。]?",
+    r"[^.!?。]*회신하실 수 없습니다[.!?。]?",
+    r"[^.!?。]*수신을 원하지 않[^.!?。]*[.!?。]?",
+    r"[^.!?。]*수신\s*거부[^.!?。]*[.!?。]?",
+    r"[^.!?。]*\bunsubscribe\b[^.!?。]*[.!?。]?",
+]
+# 발신자별로 반복되는 꼬리말을 학습하여 제거할지 여부와 학습 결과 저장 위치
+# (지난 실행까지 학습한 결과로만 제거하므로, 같은 메일은 실행 순서와 관계없이 같은 본문이 됨)
+MAIL_LEARN_BOILERPLATE = os.getenv("MAIL_LEARN_BOILERPLATE", "false").lower() == "true"
+BOILERPLATE_STATE_PATH = os.path.join(CACHE_DIRECTORY, "boilerplate.json")
+
+# 추정 Jaccard 유사도가 이 값 이상인 메일(재공지, 리마인더 등)은 같은 메일로 보고 한 번만 추출
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+# 가장 최근 메일보다 이 기간 이상 먼저 받은 대표 메일은 중복 비교 대상에서 제외 (메모리 상한)
+DEDUP_WINDOW_DAYS = float(os.getenv("DEDUP_WINDOW_DAYS", "30"))
+
+# 추출된 메일/이벤트를 저장하는 로컬 DB
+EVENT_STORE_PATH = os.path.join(CACHE_DIRECTORY, "events.sqlite3")
+
+# 임베딩에 사용할 provider (provider마다 벡터 차원이 달라 failover 없이 하나만 사용)와 요청당 최대 텍스트 수
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+# 이벤트 임베딩 인덱스 저장 위치
+EMBEDDING_INDEX_DIRECTORY = os.path.join(CACHE_DIRECTORY, "embeddings")
+
+# 개인화 digest 수신자 목록 (UserProfile JSON 배열)
+USER_PROFILES_PATH = os.path.expanduser(os.getenv("USER_PROFILES_PATH", os.path.join(CACHE_DIRECTORY, "users.json")))
+
+# digest 발송 SMTP 서버 (기본값은 로컬 디버그 서버 : python -m aiosmtpd -n -l localhost:1025)
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+DIGEST_FROM_ADDRESS = os.getenv("DIGEST_FROM_ADDRESS", "posplexity@localhost")
+
+# Microsoft Graph 메일 소스 (GRAPH_BASE_URL을 바꾸면 로컬 mock 서버로 테스트 가능)
+GRAPH_CLIENT_ID = os.getenv("GRAPH_CLIENT_ID")
+GRAPH_TENANT_ID = os.getenv("GRAPH_TENANT_ID")
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+GRAPH_SCOPES = ["https://graph.microsoft.com/Mail.Read"]
+GRAPH_MAIL_FOLDER = os.getenv("GRAPH_MAIL_FOLDER", "inbox")
+GRAPH_PAGE_SIZE = int(os.getenv("GRAPH_PAGE_SIZE", "50"))
+# Linux 서버처럼 키체인이 없는 환경에서 토큰 캐시를 평문 파일로 저장할지 여부
+GRAPH_ALLOW_UNENCRYPTED_TOKEN_CACHE = os.getenv("GRAPH_ALLOW_UNENCRYPTED_TOKEN_CACHE", "false").lower() == "true"
+
+# S3 업로드 설정 (S3_ENDPOINT_URL을 지정하면 MinIO 등 S3 호환 서버 사용)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_UPLOAD_MAX_WORKERS = int(os.getenv("S3_UPLOAD_MAX_WORKERS", "8"))
+# 이 크기(byte) 이상인 파일은 이 크기의 part로 나누어 multipart 업로드
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+
+# S3 객체 목록(manifest) 로컬 캐시 위치와, prefix별 목록을 다시 조회하는 주기(초)
+S3_MANIFEST_DIRECTORY = os.path.join(CACHE_DIRECTORY, "s3_manifest")
+S3_MANIFEST_MAX_AGE = float(os.getenv("S3_MANIFEST_MAX_AGE", "86400"))
+
+# Presigned URL 유효 시간(초). 남은 유효 시간이 이 비율 이상이면 캐시된 URL을 재사용
+S3_PRESIGN_EXPIRATION = int(os.getenv("S3_PRESIGN_EXPIRATION", "36000"))
+S3_PRESIGN_REUSE_RATIO = 0.5
+
+# 첨부파일 다운로드 설정 (저장 위치, 동시 다운로드 수, 파일당 최대 크기(byte))
+DOWNLOAD_DIRECTORY = os.path.join(CACHE_DIRECTORY, "downloads")
+DOWNLOAD_MAX_CONCURRENCY = int(os.getenv("DOWNLOAD_MAX_CONCURRENCY", "8"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# LLM에 보내는 이미지의 provider별 최대 해상도 (긴 변, 짧은 변). 이보다 크면 비용만 늘고 인식은 나아지지 않음
+# - gpt : detail=high 기준 2048x2048 안으로 줄인 뒤 짧은 변을 768로 맞춤
+# - gemini : 768px 타일 단위로 처리되므로 최대 3x3 타일 이내
+IMAGE_MAX_RESOLUTION = {
+    "gpt": (2048, 768),
+    "deepseek": (2048, 768),
+    "gemini": (2048, 2048),
+}
+IMAGE_JPEG_QUALITY = 85
+# 이미지 디코딩·리사이즈·인코딩을 실행할 스레드 수와 인코딩 결과 캐시 크기(개)
+IMAGE_ENCODE_WORKERS = int(os.getenv("IMAGE_ENCODE_WORKERS", "4"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "128"))
@@ -1,3 +1,4 @@
+from typing import Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -26,4 +27,55 @@ class Mail(BaseModel):
     summary: str
     sender: str
     date_received: str
-    events: Events=None
\ No newline at end of file
+    rowid: Optional[int]=None
+    body: str=None
+    events: Events=None
+    # 거의 같은 메일(재공지 등)로 묶여 이벤트를 복사해 온 경우, 대표 메일의 ID (src.store.make_mail_id)
+    duplicate_of: Optional[str]=None
+
+class LLMResponse(BaseModel):
+    provider: str
+    model: str
+    parsed: Any=None
+    input_tokens: int=0
+    output_tokens: int=0
+    latency: float=0.0
+
+class MailEvents(BaseModel):
+    mail_id: int
+    events: Events
+
+class PackedEvents(BaseModel):
+    results: list[MailEvents]
+
+class StoredEvent(BaseModel):
+    event_id: str
+    mail_id: str
+    kind: str
+    sender: str=None
+    subject: str
+    title: str
+    start_datetime: datetime
+    end_datetime: datetime=None
+    location: str=None
+    url: str=None
+    explanation: str
+    date_received: str=None
+
+class UserProfile(BaseModel):
+    user_id: str
+    email: str
+    name: str=None
+    interests: list[str]=[]
+    top_k: int=10
+
+class UploadReport(BaseModel):
+    uploaded: int=0
+    skipped: int=0
+    failed: list[str]=[]
+    uploaded_bytes: int=0
+    elapsed_seconds: float=0.0
+
+    @property
+    def throughput_mb_per_second(self) -> float:
+        return self.uploaded_bytes / (1024 * 1024) / self.elapsed_seconds if self.elapsed_seconds else 0.0
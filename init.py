@@ -1,22 +1,33 @@
-from azure.identity import DeviceCodeCredential
-import requests
+import asyncio, logging
 
-CLIENT_ID = "앱등록시 받은 CLIENT_ID"
-TENANT_ID = "학교 테넌트 ID (도메인별로)"
+from src.graph import GraphMailSource
+from src.llm_wrapper.client import aclose_providers
+from src.pipeline import run_pipeline
+from src.cache import ExtractionCache
+from src.store import EventStore
 
-# 1) 기기 코드 흐름으로 로그인 & 토큰 받기
-credential = DeviceCodeCredential(
-    client_id=CLIENT_ID,
-    tenant_id=TENANT_ID
-)
-token = credential.get_token("https://graph.microsoft.com/.default")
+# Mail.app 없이 (Linux 서버 등에서) Microsoft Graph로 메일을 받아 파이프라인을 실행
+# GRAPH_CLIENT_ID / GRAPH_TENANT_ID 환경변수 필요. 처음 실행할 때만 기기 코드로 로그인
+async def sync_from_graph():
+    source = GraphMailSource()
+    cache, store = ExtractionCache(), EventStore()
+    try:
+        # 지난 실행 이후 바뀐 메일만 (/delta) 가져와 추출 후 저장
+        await run_pipeline(
+            source.iter_delta(days=7),
+            sink=lambda mail: store.upsert_mails([mail]),
+            concurrency=10,
+            cache=cache,
+        )
+        # 모든 메일이 저장된 뒤에 deltaLink를 저장해야 실패 시 다음 실행에서 다시 받음
+        source.commit()
+    finally:
+        await source.aclose()
+        await aclose_providers()
+        cache.close()
+        store.close()
 
-# 2) Graph API 호출
-url = "https://graph.microsoft.com/v1.0/me/messages"
-headers = {
-    "Authorization": f"Bearer {token.token}",
-    "Content-Type": "application/json"
-}
-resp = requests.get(url, headers=headers)
-print(resp.json())
 
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(sync_from_graph())
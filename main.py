@@ -1,30 +1,72 @@
-import datetime
+import asyncio, os, time
 
-from src.fetch import fetch_mails_from_apple_mail
-from src.extract import extract_events
-from src.utils.utils import parse_mail
+from src.fetch import iter_new_mails_from_apple_mail, FETCH_STATE_PATH
+from src.cache import ExtractionCache
+from src.store import EventStore
+from src.pipeline import run_pipeline
+from src.preprocess import BoilerplateFilter
+from src.dedup import MailDeduplicator
+from src.prioritize import EmbeddingIndex, update_event_index
+from src.digest import DigestBuilder, SMTPSender, load_user_profiles, send_digests
+from src.llm_wrapper.client import closing_providers
+from src.utils.metrics import metrics
+from common.config.config import METRICS_DIRECTORY, MAIL_LEARN_BOILERPLATE
+
+
+def print_mail(mail):
+    print(f"MAIL {mail.subject}")
+    print(f"events: {mail.events}\n")
 
 
 def main():
-    # 1. Fetch & Parse Mails
-    mails = [
-        parse_mail(mail) 
-        for mail in fetch_mails_from_apple_mail(end_date=datetime.datetime(2025, 2, 23), days=7)
-    ]
-
-    # 2. Get Events from Mails
-    mails = extract_events(
-        mails=mails,
-        batch_size=10
+    cache = ExtractionCache()
+    store = EventStore()
+    # 발신자별 꼬리말 학습은 MAIL_LEARN_BOILERPLATE=true일 때만 사용 (지난 실행까지의 학습 결과로 제거)
+    boilerplate = BoilerplateFilter() if MAIL_LEARN_BOILERPLATE else None
+
+    def save_mail(mail):
+        # 2-1. Add to DB (메일 단위로 커밋하여 high-water mark와 어긋나지 않도록 함)
+        store.upsert_mails([mail])
+        print_mail(mail)
+
+    # 1. Fetch & Parse Mails → 2. Get Events from Mails
+    # 지난 실행의 high-water mark(ROWID) 이후에 도착한 메일만 가져와, 추출이 끝나는 대로 sink로 넘기는 스트리밍 파이프라인
+    # (처음 실행하면 최근 7일치부터 시작하고, sink까지 끝난 메일 기준으로 state_path에 위치를 저장)
+    # asyncio.run마다 루프가 새로 만들어지므로, 루프가 닫히기 전에 그 루프에서 만든 LLM 클라이언트를 닫음
+    asyncio.run(
+        closing_providers(
+            run_pipeline(
+                iter_new_mails_from_apple_mail(days=7, state_path=FETCH_STATE_PATH),
+                sink=save_mail,
+                concurrency=10,
+                cache=cache,
+                state_path=FETCH_STATE_PATH,
+                pack_token_budget=4000,
+                boilerplate=boilerplate,
+                dedup=MailDeduplicator(),
+            )
+        )
     )
+    cache.close()
+    if boilerplate is not None:
+        boilerplate.save()
 
-    # TODO : 2-1. Add to DB
-    
+    # 3. Make priority based on user query
+    # 새 이벤트만 임베딩하여 인덱스에 추가 (사용자별 순위는 index.rank_many로 계산)
+    index = EmbeddingIndex.load()
+    events = asyncio.run(closing_providers(update_event_index(store, index)))
+    index.save()
+    store.close()
 
-    # TODO : 3. Make priority based on user query
-    
+    # 4. Make & Send Personalized Email
+    # 추출·임베딩은 메일 단위로 한 번만 하고, 사용자별로는 순위 계산과 메일 조립만 함
+    digests = asyncio.run(closing_providers(DigestBuilder(events, index).build(load_user_profiles())))
+    with SMTPSender() as sender:
+        send_digests(digests, sender)
 
-    # TODO : 4. Make & Send Personalized Email 
+    # 실행 리포트 저장 (단계별 소요 시간, 토큰, 비용, 캐시 적중률)
+    metrics.write_report(os.path.join(METRICS_DIRECTORY, f"run-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    metrics.write_prometheus(os.path.join(METRICS_DIRECTORY, "posplexity.prom"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+from typing import Callable, Optional
+from common.config.config import CACHE_DIRECTORY
+from common.types.types import Events, Mail
+from src.cache import ExtractionCache, make_cache_key
+from src.extract import EXTRACT_PROMPT, build_mail_prompt
+from src.llm_wrapper.client import get_provider
+from src.llm_wrapper.prompt_registry import load_prompt
+
+import os, json, time, logging, threading, uuid
+
+BATCH_DIRECTORY = os.path.join(CACHE_DIRECTORY, "batch")
+
+# 배치 작업 상태
+BATCH_RUNNING = "running"
+BATCH_SUCCEEDED = "succeeded"
+BATCH_FAILED = "failed"
+
+
+def build_batch_request(target_prompt: str, prompt_in_path: str, output_structure) -> dict:
+    """
+    Gemini batch JSONL 한 줄에 들어갈 GenerateContentRequest를 만듭니다.
+    """
+    prompt = load_prompt(prompt_in_path)
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt.render(target_prompt)}]}],
+        "system_instruction": {"parts": [{"text": prompt.system_prompt}]},
+        "generation_config": {
+            "response_mime_type": "application/json",
+            "response_json_schema": output_structure.model_json_schema(),
+        },
+    }
+
+
+def write_batch_job(
+    mails: list[Mail], job_path: str, prompt_in_path: str = EXTRACT_PROMPT, output_structure=Events
+) -> list[str]:
+    """
+    메일별 추출 요청을 JSONL 작업 파일로 씁니다. key는 mails 내 순번입니다.
+    """
+    keys = []
+    os.makedirs(os.path.dirname(job_path) or ".", exist_ok=True)
+    with open(job_path, "w", encoding="utf-8") as file:
+        for index, mail in enumerate(mails):
+            key = str(index)
+            request = build_batch_request(build_mail_prompt(mail), prompt_in_path, output_structure)
+            file.write(json.dumps({"key": key, "request": request}, ensure_ascii=False) + "\n")
+            keys.append(key)
+    return keys
+
+
+def read_batch_results(result_path: str, output_structure=Events) -> dict:
+    """
+    결과 JSONL을 읽어 {key: 파싱된 결과}를 반환합니다.
+    실패했거나 파싱할 수 없는 요청은 None으로 둡니다.
+    """
+    results = {}
+    with open(result_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key, parsed = item.get("key"), None
+            try:
+                parts = item["response"]["candidates"][0]["content"]["parts"]
+                parsed = output_structure.model_validate_json("".join(part.get("text", "") for part in parts))
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logging.warning(f"[BATCH] Failed to parse result {key}: {item.get('error') or e}")
+            results[key] = parsed
+    return results
+
+
+def merge_batch_results(mails: list[Mail], results: dict) -> list[Mail]:
+    """
+    배치 결과를 순번(key)에 맞춰 Mail.events에 반영합니다.
+    """
+    for index, mail in enumerate(mails):
+        events = results.get(str(index))
+        if events is not None:
+            mail.events = events
+    return mails
+
+
+class BatchBackend:
+    """
+    배치 작업을 제출/조회/다운로드하는 인터페이스입니다.
+    model은 배치 요청을 처리하는 모델 이름으로, 추출 결과의 캐시 키에 사용됩니다.
+    """
+
+    model: str
+
+    def submit(self, job_path: str) -> str:
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> str:
+        raise NotImplementedError
+
+    def download(self, job_id: str, result_path: str):
+        raise NotImplementedError
+
+
+class GeminiBatchBackend(BatchBackend):
+    """
+    Gemini Batch API를 사용합니다. (google-genai 1.24 이상의 files / batches API 필요)
+    """
+
+    _states = {
+        "JOB_STATE_SUCCEEDED": BATCH_SUCCEEDED,
+        "JOB_STATE_PARTIALLY_SUCCEEDED": BATCH_SUCCEEDED,
+        "JOB_STATE_FAILED": BATCH_FAILED,
+        "JOB_STATE_CANCELLED": BATCH_FAILED,
+        "JOB_STATE_EXPIRED": BATCH_FAILED,
+    }
+
+    def __init__(self, model: Optional[str] = None):
+        from google import genai
+
+        provider = get_provider("gemini")
+        self.model = model or provider.model
+        self.client = genai.Client(api_key=provider.api_key)
+
+    def submit(self, job_path: str) -> str:
+        uploaded = self.client.files.upload(
+            file=job_path,
+            config={"mime_type": "jsonl", "display_name": os.path.basename(job_path)},
+        )
+        job = self.client.batches.create(
+            model=self.model,
+            src=uploaded.name,
+            config={"display_name": os.path.basename(job_path)},
+        )
+        logging.info(f"[BATCH] Submitted {job.name} ({job_path})")
+        return job.name
+
+    def status(self, job_id: str) -> str:
+        job = self.client.batches.get(name=job_id)
+        return self._states.get(job.state.name, BATCH_RUNNING)
+
+    def download(self, job_id: str, result_path: str):
+        job = self.client.batches.get(name=job_id)
+        content = self.client.files.download(file=job.dest.file_name)
+        with open(result_path, "wb") as file:
+            file.write(content)
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    테스트용 로컬 배치 서버입니다.
+    제출된 작업을 백그라운드 스레드에서 handler(request) -> GenerateContentResponse(dict)로 처리하여
+    Gemini Batch API와 같은 형식의 결과 JSONL을 만듭니다.
+    """
+
+    def __init__(self, handler: Callable[[dict], dict], work_dir: str = BATCH_DIRECTORY, model: Optional[str] = None):
+        self.handler = handler
+        self.model = model or get_provider("gemini").model
+        self.work_dir = work_dir
+        self.jobs = {}
+
+    def _run(self, job_id: str, job_path: str):
+        result_path = os.path.join(self.work_dir, f"{job_id}.output.jsonl")
+        try:
+            with open(job_path, "r", encoding="utf-8") as src, open(result_path, "w", encoding="utf-8") as dest:
+                for line in src:
+                    item = json.loads(line)
+                    try:
+                        output = {"key": item["key"], "response": self.handler(item["request"])}
+                    except Exception as e:
+                        output = {"key": item["key"], "error": {"message": str(e)}}
+                    dest.write(json.dumps(output, ensure_ascii=False) + "\n")
+            self.jobs[job_id] = (BATCH_SUCCEEDED, result_path)
+        except Exception as e:
+            logging.error(f"[BATCH] Local job {job_id} failed: {e}")
+            self.jobs[job_id] = (BATCH_FAILED, None)
+
+    def submit(self, job_path: str) -> str:
+        os.makedirs(self.work_dir, exist_ok=True)
+        job_id = f"local-{uuid.uuid4().hex}"
+        self.jobs[job_id] = (BATCH_RUNNING, None)
+        threading.Thread(target=self._run, args=(job_id, job_path), daemon=True).start()
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        return self.jobs[job_id][0]
+
+    def download(self, job_id: str, result_path: str):
+        _, local_path = self.jobs[job_id]
+        if os.path.abspath(local_path) != os.path.abspath(result_path):
+            os.replace(local_path, result_path)
+
+
+def run_batch_extraction(
+    mails: list[Mail],
+    backend: BatchBackend,
+    job_dir: str = BATCH_DIRECTORY,
+    poll_interval: float = 60.0,
+    cache: Optional[ExtractionCache] = None,
+) -> list[Mail]:
+    """
+    대량 백필용 오프라인 배치 추출입니다.
+    캐시에 없는 메일만 JSONL 작업으로 제출하고, 완료될 때까지 poll_interval마다 상태를 확인한 뒤
+    결과를 Mail.events에 반영합니다. 응답 지연은 길지만 처리량이 높고 비용이 낮습니다.
+    """
+    targets, cache_keys = [], []
+    for mail in mails:
+        if cache is not None:
+            # 배치 backend가 실제로 사용하는 모델의 키 (온라인 provider의 모델과 다를 수 있음)
+            cache_key = make_cache_key(backend.model, EXTRACT_PROMPT, Events, build_mail_prompt(mail))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                mail.events = Events.model_validate_json(cached)
+                continue
+            cache_keys.append(cache_key)
+        targets.append(mail)
+
+    if not targets:
+        return mails
+
+    job_name = f"extract-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    job_path = os.path.join(job_dir, f"{job_name}.jsonl")
+    write_batch_job(targets, job_path)
+    logging.info(f"[BATCH] {len(targets)} requests written to {job_path}")
+
+    job_id = backend.submit(job_path)
+    while (state := backend.status(job_id)) == BATCH_RUNNING:
+        time.sleep(poll_interval)
+    if state == BATCH_FAILED:
+        raise RuntimeError(f"Batch job {job_id} failed")
+
+    result_path = os.path.join(job_dir, f"{job_name}.output.jsonl")
+    backend.download(job_id, result_path)
+    results = read_batch_results(result_path)
+    merge_batch_results(targets, results)
+
+    if cache is not None:
+        for mail, cache_key in zip(targets, cache_keys):
+            if mail.events is not None:
+                cache.set(cache_key, mail.events.model_dump_json())
+
+    missing = sum(mail.events is None for mail in targets)
+    logging.info(f"[BATCH] Job {job_id} merged: {len(targets) - missing} succeeded, {missing} failed")
+    return mails
@@ -0,0 +1,75 @@
+from typing import Optional
+from common.config.config import CACHE_DIRECTORY
+from src.llm_wrapper.prompt_registry import load_prompt
+from src.utils.metrics import metrics
+
+import sqlite3, os, json, hashlib, time, functools
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_json(output_structure) -> str:
+    return json.dumps(output_structure.model_json_schema(), sort_keys=True)
+
+
+def make_cache_key(model: str, prompt_in_path: str, output_structure, payload: str) -> str:
+    """
+    모델 이름, 프롬프트 파일 내용, 출력 스키마, 메일 내용을 해시하여 캐시 키를 만듭니다.
+    프롬프트나 스키마가 바뀌면 키가 달라지므로 이전 결과는 자연스럽게 무효화됩니다.
+    """
+    hasher = hashlib.sha256()
+    for part in (
+        model.encode("utf-8"),
+        load_prompt(prompt_in_path).digest.encode("utf-8"),
+        _schema_json(output_structure).encode("utf-8"),
+        payload.encode("utf-8"),
+    ):
+        # 필드 경계를 명확히 하기 위해 길이를 함께 해시
+        hasher.update(len(part).to_bytes(8, "big"))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+class ExtractionCache:
+    """
+    LLM 추출 결과를 SQLite에 저장하는 content-addressed 캐시입니다.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            db_path = os.path.join(CACHE_DIRECTORY, "extraction_cache.sqlite3")
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, key: str, *fallback_keys: str) -> Optional[str]:
+        """
+        key에 저장된 값을 반환합니다. 없으면 fallback_keys를 순서대로 조회합니다.
+        """
+        for candidate in (key,) + fallback_keys:
+            row = self.conn.execute(
+                "SELECT value FROM extraction_cache WHERE key = ?", (candidate,)
+            ).fetchone()
+            if row:
+                metrics.inc("extraction_cache_requests_total", result="hit")
+                return row[0]
+        metrics.inc("extraction_cache_requests_total", result="miss")
+        return None
+
+    def set(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, int(time.time())),
+            )
+
+    def close(self):
+        self.conn.close()
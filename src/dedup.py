@@ -0,0 +1,218 @@
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from common.config.config import DEDUP_THRESHOLD, DEDUP_WINDOW_DAYS
+from common.types.types import Events, Mail
+from src.store import make_mail_id
+from src.utils.metrics import metrics
+
+import hashlib, random, re
+
+# 재공지, 리마인더 등 같은 공지를 다시 보낼 때 제목에 붙는 말머리
+# "연장", "마감 임박"은 일정이 바뀌었다는 뜻일 수 있으므로 떼지 않음 (기존 공지와 다른 메일로 추출)
+RESEND_PREFIX_PATTERN = re.compile(
+    r"^\s*((\[|\()?\s*(재공지|재안내|재발송|재|re|fw|fwd|reminder|리마인더)\s*(\]|\)|:)\s*)+",
+    re.IGNORECASE,
+)
+SHINGLE_SIZE = 5
+# 날짜·시각·금액·차수 등 숫자 토큰 ("3월 14일", "14:00", "2차"의 3, 14, 14, 00, 2)
+NUMBER_PATTERN = re.compile(r"\d+")
+MAX_HASH = (1 << 64) - 1
+
+
+def normalize_subject(subject: str) -> str:
+    return RESEND_PREFIX_PATTERN.sub("", subject or "").strip()
+
+
+def mail_fingerprint_text(mail: Mail) -> str:
+    """
+    중복 판단에 사용할 텍스트입니다. 말머리를 뗀 제목과 본문(body가 없으면 summary)을 사용합니다.
+    """
+    return normalize_subject(mail.subject) + "\n" + (mail.body if mail.body is not None else mail.summary or "")
+
+
+def _received_timestamp(mail: Mail) -> Optional[float]:
+    """
+    "YYYY-MM-DD HH:MM:SS"(UTC) 또는 ISO 형식의 date_received를 epoch 초로 바꿉니다. 읽을 수 없으면 None입니다.
+    """
+    try:
+        received = datetime.fromisoformat(mail.date_received)
+    except (TypeError, ValueError):
+        return None
+    if received.tzinfo is None:
+        received = received.replace(tzinfo=timezone.utc)
+    return received.timestamp()
+
+
+def number_tokens(text: str) -> frozenset:
+    """
+    텍스트의 숫자 토큰 집합입니다. 본문이 거의 같아도 날짜나 시각이 바뀐 메일(기간 연장 등)을 구분하는 데 사용합니다.
+    """
+    return frozenset(token.lstrip("0") or "0" for token in NUMBER_PATTERN.findall(text))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[int]:
+    """
+    공백을 제거한 텍스트의 글자 size-gram을 64bit 해시 집합으로 만듭니다.
+    """
+    text = "".join(text.lower().split())
+    if len(text) <= size:
+        text = text.ljust(size)
+    return {
+        int.from_bytes(hashlib.blake2b(text[i:i + size].encode(), digest_size=8).digest(), "big")
+        for i in range(len(text) - size + 1)
+    }
+
+
+class MinHashLSH:
+    """
+    MinHash 서명과 LSH(band) 버킷으로 Jaccard 유사도가 threshold 이상인 텍스트를 찾습니다.
+    - 서명은 shingle 해시에 num_perm개의 XOR 마스크를 씌운 최솟값입니다.
+    - 서명을 bands개로 나누어 한 band라도 같으면 후보로 보고, 추정 유사도로 다시 확인합니다.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        hashes = shingles(text)
+        return tuple(min(h ^ mask for h in hashes) for mask in self.masks)
+
+    @staticmethod
+    def similarity(a: tuple, b: tuple) -> float:
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+    def _bands(self, signature: tuple):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def query(self, signature: tuple, accept: Optional[Callable] = None):
+        """
+        signature와 가장 비슷한 등록된 key를 반환합니다. threshold 미만이면 None입니다.
+        accept가 주어지면 accept(key)가 참인 key만 후보로 봅니다.
+        """
+        best_key, best_score = None, self.threshold
+        seen = set()
+        for band, value in self._bands(signature):
+            for key in self.buckets[band].get(value, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if accept is not None and not accept(key):
+                    continue
+                score = self.similarity(signature, self.signatures[key])
+                if score >= best_score:
+                    best_key, best_score = key, score
+        return best_key
+
+    def insert(self, key, signature: tuple):
+        self.signatures[key] = signature
+        for band, value in self._bands(signature):
+            self.buckets[band].setdefault(value, []).append(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key)
+        for band, value in self._bands(signature):
+            bucket = self.buckets[band][value]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[band][value]
+
+
+class MailDeduplicator:
+    """
+    들어오는 메일을 거의 같은 메일끼리 묶습니다. 각 묶음(cluster)의 첫 메일이 대표이며,
+    대표 메일만 이벤트를 추출하고 그 결과를 나머지 메일에 복사합니다.
+    - 본문이 거의 같아도 숫자 토큰(날짜, 시각 등)이 다르면 다른 메일로 봅니다. (기간 연장 공지 등은 다시 추출)
+    - 메일 자체는 보관하지 않고, 대표 메일 ID(make_mail_id)별 서명, 숫자 토큰, 수신 시각, 추출이 끝난 이벤트만 보관합니다.
+    - 가장 최근에 본 메일보다 window_days 이상 먼저 받은 대표 메일은 잊습니다. (메일은 대략 수신 순으로 들어옴)
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, window_days: float = DEDUP_WINDOW_DAYS, **lsh_options):
+        self.lsh = MinHashLSH(threshold=threshold, **lsh_options)
+        self.window = window_days * 86400
+        self.received = {}  # 대표 메일 ID -> 수신 시각 (추가된 순서)
+        self.numbers = {}  # 대표 메일 ID -> 숫자 토큰 집합
+        self.events = {}  # 대표 메일 ID -> 추출된 Events (추출이 끝난 대표 메일만)
+        self.latest = None
+
+    def _evict(self):
+        cutoff = self.latest - self.window
+        while self.received:
+            key, received = next(iter(self.received.items()))
+            if received is not None and received >= cutoff:
+                break
+            del self.received[key]
+            del self.numbers[key]
+            self.events.pop(key, None)
+            self.lsh.remove(key)
+
+    def add(self, mail: Mail) -> Optional[str]:
+        """
+        mail이 이미 본 메일과 거의 같으면 그 대표 메일의 ID를, 새로운 메일이면 None을 반환합니다.
+        """
+        received = _received_timestamp(mail)
+        if received is not None and (self.latest is None or received > self.latest):
+            self.latest = received
+            self._evict()
+
+        text = mail_fingerprint_text(mail)
+        signature, numbers = self.lsh.signature(text), number_tokens(text)
+        key = self.lsh.query(signature, accept=lambda candidate: self.numbers[candidate] == numbers)
+        if key is not None:
+            metrics.inc("dedup_mails_total", result="duplicate")
+            return key
+
+        key = make_mail_id(mail)
+        if key not in self.received:
+            self.received[key] = received
+            self.numbers[key] = numbers
+            self.lsh.insert(key, signature)
+        metrics.inc("dedup_mails_total", result="unique")
+        return None
+
+    def resolve(self, mail: Mail):
+        """
+        대표 메일의 추출이 끝났을 때 호출하여, 이후 들어오는 중복 메일에 복사할 이벤트를 기록합니다.
+        """
+        key = make_mail_id(mail)
+        if key in self.received:
+            self.events[key] = mail.events
+
+    def is_resolved(self, key: str) -> bool:
+        return key in self.events
+
+    def copy_events(self, key: str, target: Mail) -> Mail:
+        events: Optional[Events] = self.events[key]
+        target.events = events.model_copy(deep=True) if events is not None else None
+        target.duplicate_of = key
+        return target
+
+
+def copy_events(source: Mail, target: Mail) -> Mail:
+    """
+    대표 메일의 이벤트를 target에 복사하고 target.duplicate_of에 대표 메일 ID를 기록합니다.
+    EventStore는 duplicate_of가 있는 메일의 이벤트를 따로 저장하지 않으므로 같은 이벤트가 한 번만 남습니다.
+    """
+    target.events = source.events.model_copy(deep=True) if source.events is not None else None
+    target.duplicate_of = make_mail_id(source)
+    return target
+
+
+def cluster_mails(mails: list[Mail], threshold: float = DEDUP_THRESHOLD) -> list[list[Mail]]:
+    """
+    메일 리스트를 거의 같은 메일끼리 묶습니다. 각 cluster의 첫 메일이 대표입니다.
+    """
+    deduplicator, clusters = MailDeduplicator(threshold), {}
+    for mail in mails:
+        key = deduplicator.add(mail) or make_mail_id(mail)
+        clusters.setdefault(key, []).append(mail)
+    return list(clusters.values())
@@ -0,0 +1,239 @@
+from datetime import datetime
+from email.message import EmailMessage
+from html import escape
+from urllib.parse import urlparse
+from typing import Optional
+from common.config.config import (
+    USER_PROFILES_PATH,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USERNAME,
+    SMTP_PASSWORD,
+    SMTP_USE_TLS,
+    DIGEST_FROM_ADDRESS,
+)
+from common.types.types import StoredEvent, UserProfile
+from src.prioritize import EmbeddingIndex, embed_user_queries
+from src.utils.metrics import metrics
+from src.utils.s3 import S3Presigner, get_s3_presigner
+
+import os, json, logging, smtplib
+
+WEEKDAYS = "월화수목금토일"
+
+
+def load_user_profiles(path: str = USER_PROFILES_PATH) -> list[UserProfile]:
+    if not os.path.exists(path):
+        logging.warning(f"[DIGEST] User profile file not found: {path}")
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return [UserProfile.model_validate(item) for item in json.load(file)]
+
+
+def _format_datetime(value: datetime) -> str:
+    return f"{value:%m/%d}({WEEKDAYS[value.weekday()]}) {value:%H:%M}"
+
+
+def render_event(event: StoredEvent) -> tuple[str, str]:
+    """
+    이벤트 하나를 (text, html) 조각으로 렌더링합니다.
+    """
+    when = _format_datetime(event.start_datetime)
+    if event.end_datetime:
+        when += f" ~ {_format_datetime(event.end_datetime)}"
+    where = event.location or event.url or ""
+
+    text = f"- {event.title}\n  {when}" + (f" / {where}" if where else "") + f"\n  {event.explanation}"
+    where_html = (
+        f'<a href="{escape(event.url)}">{escape(event.url)}</a>' if event.url and not event.location else escape(where)
+    )
+    html = (
+        f"<li><b>{escape(event.title)}</b><br>"
+        f"{escape(when)}" + (f" / {where_html}" if where else "") + "<br>"
+        f"<small>{escape(event.explanation)}</small></li>"
+    )
+    return text, html
+
+
+class DigestBuilder:
+    """
+    공유된 이벤트 집합으로 여러 사용자의 digest를 만듭니다.
+    - 이벤트 렌더링은 이벤트마다 한 번만 하고 모든 사용자가 재사용합니다.
+    - 사용자별로는 순위 계산(EmbeddingIndex.rank_many)과 조각을 이어 붙이는 작업만 합니다.
+    - url이 s3://bucket/key인 이벤트(첨부파일 등)는 보낼 이벤트의 링크를 한 번에 Presigned URL로 바꿉니다.
+    """
+
+    def __init__(self, events: list[StoredEvent], index: EmbeddingIndex, presigner: Optional[S3Presigner] = None):
+        self.events = {event.event_id: event for event in events}
+        self.index = index
+        self.presigner = presigner
+        self._rendered = {}
+        self._links = {}
+
+    def presign_links(self, event_ids: list[str]):
+        """
+        s3:// 링크를 버킷별로 모아 Presigned URL로 바꿉니다.
+        """
+        by_bucket = {}
+        for event_id in event_ids:
+            url = self.events[event_id].url
+            if url and url.startswith("s3://") and event_id not in self._links:
+                parsed = urlparse(url)
+                by_bucket.setdefault(parsed.netloc, []).append((event_id, parsed.path.lstrip("/")))
+        if not by_bucket:
+            return
+
+        presigner = self.presigner or get_s3_presigner()
+        for bucket_name, items in by_bucket.items():
+            urls = presigner.presign_many(bucket_name, [key for _, key in items])
+            for event_id, key in items:
+                self._links[event_id] = urls[key]
+
+    def rendered(self, event_id: str) -> tuple[str, str]:
+        value = self._rendered.get(event_id)
+        if value is None:
+            event = self.events[event_id]
+            if event_id in self._links:
+                event = event.model_copy(update={"url": self._links[event_id]})
+            value = self._rendered[event_id] = render_event(event)
+        return value
+
+    def compose(self, profile: UserProfile, ranked: list[tuple[str, float]], now: datetime) -> Optional[EmailMessage]:
+        """
+        순위가 매겨진 이벤트로 사용자 한 명의 메일을 만듭니다. 보낼 이벤트가 없으면 None입니다.
+        """
+        event_ids = [event_id for event_id, _ in ranked if event_id in self.events]
+        if not event_ids:
+            return None
+        fragments = [self.rendered(event_id) for event_id in event_ids]
+        greeting = f"{profile.name}님, " if profile.name else ""
+
+        message = EmailMessage()
+        message["Subject"] = f"[POSPLEXITY] {now:%m/%d} 맞춤 이벤트 {len(event_ids)}건"
+        message["From"] = DIGEST_FROM_ADDRESS
+        message["To"] = profile.email
+        message.set_content(
+            f"{greeting}관심사에 맞는 이벤트를 골랐습니다.\n\n" + "\n\n".join(text for text, _ in fragments)
+        )
+        message.add_alternative(
+            f"<p>{escape(greeting)}관심사에 맞는 이벤트를 골랐습니다.</p><ol>"
+            + "".join(html for _, html in fragments)
+            + "</ol>",
+            subtype="html",
+        )
+        return message
+
+    async def build(self, profiles: list[UserProfile], now: Optional[datetime] = None) -> list[EmailMessage]:
+        """
+        모든 사용자의 관심사를 한 번에 임베딩·채점하고 사용자별 digest 메일을 만듭니다.
+        """
+        now = now or datetime.now()
+        with metrics.stage("digest"):
+            user_vectors = await embed_user_queries({profile.user_id: profile.interests for profile in profiles})
+            top_k = max((profile.top_k for profile in profiles), default=0)
+            # 인덱스에만 남아 있는 이벤트가 상위 top_k 자리를 차지하지 않도록 보낼 수 있는 이벤트만 후보로 둠
+            ranked = self.index.rank_many(user_vectors, top_k=top_k, now=now.timestamp(), allowed_ids=self.events)
+            self.presign_links(list({
+                event_id for profile in profiles for event_id, _ in ranked[profile.user_id][:profile.top_k]
+            }))
+
+            digests = []
+            for profile in profiles:
+                message = self.compose(profile, ranked[profile.user_id][:profile.top_k], now)
+                if message is not None:
+                    digests.append(message)
+        logging.info(f"[DIGEST] {len(digests)} digests built for {len(profiles)} users, {len(self._rendered)} events rendered")
+        return digests
+
+
+class DigestSender:
+    """
+    digest 메일 발송 인터페이스입니다. with 블록 안에서 여러 메일을 보낼 수 있습니다.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, message: EmailMessage):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SMTPSender(DigestSender):
+    """
+    SMTP로 발송합니다. 연결 하나로 모든 메일을 보냅니다.
+    기본 설정은 로컬 디버그 서버(localhost:1025)이므로 실제로 발송되지 않고 서버 콘솔에 출력됩니다.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SMTP_USERNAME,
+        password: Optional[str] = SMTP_PASSWORD,
+        use_tls: bool = SMTP_USE_TLS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._smtp = None
+
+    @property
+    def smtp(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.use_tls:
+                self._smtp.starttls()
+            if self.username:
+                self._smtp.login(self.username, self.password)
+        return self._smtp
+
+    def send(self, message: EmailMessage):
+        self.smtp.send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class FileSender(DigestSender):
+    """
+    메일을 .eml 파일로 저장합니다. (SMTP 서버 없이 결과 확인용)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message: EmailMessage):
+        path = os.path.join(self.directory, f"{message['To']}.eml")
+        with open(path, "wb") as file:
+            file.write(message.as_bytes())
+
+
+def send_digests(digests: list[EmailMessage], sender: DigestSender) -> int:
+    """
+    digest를 발송합니다. 실패한 메일은 건너뛰고, 보낸 개수를 반환합니다.
+    """
+    sent = 0
+    with metrics.stage("send"):
+        for message in digests:
+            try:
+                sender.send(message)
+                sent += 1
+                metrics.inc("digests_sent_total", status="ok")
+            except (smtplib.SMTPException, OSError) as e:
+                metrics.inc("digests_sent_total", status="error")
+                logging.error(f"[DIGEST] Failed to send to {message['To']}: {e}")
+    return sent
@@ -0,0 +1,346 @@
+import os
+import re
+import json
+import mmap
+import logging
+import plistlib
+import quopri
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from email import policy
+from email.message import Message
+from email.parser import BytesParser, BytesHeaderParser
+from typing import Iterator, Optional, Tuple
+
+from common.config.config import MAIL_ROOT_DIRECTORY, CACHE_DIRECTORY
+
+# 이미 파싱한 .emlx 파일 목록 (path -> [inode, mtime_ns])
+# headers_only 스캔은 같은 경로의 ".headers.json" 파일에 따로 기록한다. (_seen_path_for 참고)
+EMLX_SEEN_PATH = os.path.join(CACHE_DIRECTORY, "emlx_seen.json")
+
+# 헤더 끝(빈 줄) 탐색용
+HEADER_END_PATTERN = re.compile(b"\r?\n\r?\n")
+
+
+def read_emlx_byte_count(raw_data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    .emlx 파일 첫 줄의 바이트 수(메일 본문 길이)를 읽는다.
+
+    Returns:
+        (message_start, message_length): 첫 줄이 숫자가 아니면 None
+    """
+    newline = raw_data.find(b"\n", 0, 32)
+    if newline <= 0:
+        return None
+    first_line = raw_data[:newline].strip()
+    if not first_line.isdigit():
+        return None
+    return newline + 1, int(first_line)
+
+
+def parse_emlx(raw_data: bytes) -> Tuple[Message, Optional[dict]]:
+    """
+    Apple Mail .emlx 파일을 파싱한다.
+    1) RFC5322(헤더 + 본문) 부분을 email.message.Message 객체로 만들고,
+    2) 파일 끝에 붙은 plist (Apple Mail 메타데이터)가 있으면 dict로 반환한다.
+
+    Args:
+        raw_data (bytes | mmap): .emlx 파일의 전체 바이트 내용
+
+    Returns:
+        (parsed_email, plist_dict):
+            parsed_email (Message): 파싱된 이메일 객체 (헤더, 본문, 첨부 등)
+            plist_dict (dict | None): Apple Mail이 추가로 저장하는 plist 메타정보
+    """
+    # 1) 첫 줄의 바이트 수로 메일 / plist 경계를 바로 찾고,
+    #    바이트 수가 없는 파일이면 plist 구문(<?xml ...) 시작점을 정규식으로 탐색
+    byte_count = read_emlx_byte_count(raw_data)
+    match = None if byte_count else re.search(b'<\\?xml.*', raw_data, flags=re.DOTALL)
+    if byte_count:
+        message_start, message_length = byte_count
+        email_bytes = raw_data[message_start:message_start + message_length]
+        plist_bytes = raw_data[message_start + message_length:].strip() or None
+    elif match:
+        xml_start_idx = match.start()
+        # 메일 (RFC5322) 부분
+        email_bytes = raw_data[:xml_start_idx].rstrip(b"\r\n")
+        # plist 부분
+        plist_bytes = raw_data[xml_start_idx:]
+    else:
+        # plist가 없거나 못 찾은 경우 → 전체를 메일로만 처리 (mmap이어도 bytes로 복사)
+        email_bytes = raw_data[:]
+        plist_bytes = None
+
+    # 2) 이메일 부분 파싱
+    #    policy=policy.default로 설정해주면 Python 3.6+ 기준으로
+    #    새 헤더 파싱 규칙 및 디코딩이 적용된다.
+    parsed_email: Message = BytesParser(policy=policy.default).parsebytes(email_bytes)
+
+    # 3) plist 부분 파싱 (있으면 시도)
+    plist_dict = None
+    if plist_bytes:
+        try:
+            plist_dict = plistlib.loads(plist_bytes)
+        except Exception:
+            # plist 파싱 실패하면 None으로 둔다
+            plist_dict = None
+
+    return parsed_email, plist_dict
+
+class LazyEmlx:
+    """
+    .emlx 파일의 헤더만 먼저 파싱하고, 본문과 plist는 필요할 때 읽는다.
+    - 생성 시 파일 앞부분(HEAD_CHUNK 단위)만 읽어 Subject/From/Date 등 헤더를 파싱한다.
+    - message / plist 속성에 처음 접근할 때 파일의 해당 구간만 다시 읽어 파싱한다.
+    발신자 등으로 대량의 메일을 거를 때 메일당 수 KB만 읽으면 된다.
+    """
+
+    HEAD_CHUNK = 8192
+
+    def __init__(self, path: str):
+        self.path = path
+        self._message = None
+        self._plist = None
+        self._plist_loaded = False
+
+        with open(path, "rb") as f:
+            head = f.read(self.HEAD_CHUNK)
+            byte_count = read_emlx_byte_count(head)
+            self.message_start, self.message_length = byte_count or (0, None)
+
+            # 헤더 끝(빈 줄)이 나올 때까지 조금씩 더 읽는다
+            while True:
+                match = HEADER_END_PATTERN.search(head, self.message_start)
+                if match:
+                    header_end = match.end()
+                    break
+                chunk = f.read(self.HEAD_CHUNK)
+                if not chunk:
+                    header_end = len(head)
+                    break
+                head += chunk
+
+        if self.message_length is not None:
+            header_end = min(header_end, self.message_start + self.message_length)
+        self.headers: Message = BytesHeaderParser(policy=policy.default).parsebytes(
+            head[self.message_start:header_end]
+        )
+
+    def __getitem__(self, name: str):
+        return self.headers[name]
+
+    def get(self, name: str, default=None):
+        return self.headers.get(name, default)
+
+    @property
+    def message(self) -> Message:
+        """
+        본문과 첨부를 포함한 전체 메일 (처음 접근할 때 파싱)
+        """
+        if self._message is None:
+            if self.message_length is None:
+                with open(self.path, "rb") as f:
+                    self._message, self._plist = parse_emlx(f.read())
+                self._plist_loaded = True
+            else:
+                with open(self.path, "rb") as f:
+                    f.seek(self.message_start)
+                    email_bytes = f.read(self.message_length)
+                self._message = BytesParser(policy=policy.default).parsebytes(email_bytes)
+        return self._message
+
+    @property
+    def plist(self) -> Optional[dict]:
+        """
+        Apple Mail plist 메타정보 (처음 접근할 때 파싱)
+        """
+        if not self._plist_loaded:
+            if self.message_length is None:
+                self.message  # 바이트 수가 없는 파일은 전체 파싱으로 plist도 함께 얻는다
+            else:
+                with open(self.path, "rb") as f:
+                    f.seek(self.message_start + self.message_length)
+                    plist_bytes = f.read().strip()
+                try:
+                    self._plist = plistlib.loads(plist_bytes) if plist_bytes else None
+                except Exception:
+                    self._plist = None
+            self._plist_loaded = True
+        return self._plist
+
+
+def extract_html_body(msg: Message) -> str:
+    """
+    주어진 email.message.Message 객체에서 text/html 파트를 찾아 디코딩하여 반환한다.
+    - LazyEmlx가 주어지면 이 시점에 본문을 파싱한다.
+    - 멀티파트라면 각 파트를 순회하며 "text/html" 파트를 찾음
+    - 싱글파트면 바로 본문 디코딩
+    - 만약 text/html이 없으면 빈 문자열 반환
+
+    Args:
+        msg (Message | LazyEmlx): 이메일 메시지 객체
+
+    Returns:
+        html_content (str): 디코딩된 HTML 문자열 (없으면 "")
+    """
+    if isinstance(msg, LazyEmlx):
+        msg = msg.message
+
+    if msg.is_multipart():
+        # 여러 파트가 있는 경우, 각 파트를 walk()하면서 text/html 파트를 찾는다.
+        for part in msg.walk():
+            if part.get_content_type() == "text/html":
+                payload = part.get_payload(decode=True)
+                # 인코딩 정보 가져오기
+                charset = part.get_content_charset() or "utf-8"
+                return payload.decode(charset, errors="replace")
+        return ""  # text/html 파트를 못 찾은 경우
+    else:
+        # 싱글파트
+        ctype = msg.get_content_type()
+        if ctype == "text/html":
+            payload = msg.get_payload(decode=True)
+            charset = msg.get_content_charset() or "utf-8"
+            return payload.decode(charset, errors="replace")
+        else:
+            return ""  # 싱글파트지만 text/plain만 있거나 다른 타입일 수 있음
+
+def decode_quoted_printable(encoded_str: str, encoding: str = "utf-8") -> str:
+    """
+    Quoted-Printable 로 인코딩된 문자열을 직접 디코딩하는 헬퍼 함수.
+    (이메일 모듈을 거치지 않고, 로 raw QP 문자열만 있을 때 사용)
+
+    Args:
+        encoded_str (str): =xx=yy 형태의 QP 인코딩된 문자열
+        encoding (str): 최종 해석할 문자열 인코딩 (기본: 'utf-8')
+
+    Returns:
+        decoded (str): 사람이 읽을 수 있는 해석 결과
+    """
+    # str → bytes
+    raw = encoded_str.encode(encoding, errors="replace")
+    # quopri.decodestring로 QP 디코딩
+    decoded_bytes = quopri.decodestring(raw)
+    return decoded_bytes.decode(encoding, errors="replace")
+
+
+def iter_emlx_paths(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    root 아래의 모든 .emlx(.partial.emlx 포함) 파일 경로와 stat 정보를 반환한다.
+    os.scandir의 DirEntry.stat()을 사용하여 파일마다 별도의 stat 호출을 줄인다.
+    """
+    stack = [os.path.expanduser(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".emlx"):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+        except OSError as e:
+            logging.warning(f"Failed to scan {directory}: {e}")
+
+
+def parse_emlx_headers(path: str) -> Tuple[str, Optional[LazyEmlx], None]:
+    """
+    .emlx 파일의 헤더만 파싱한다. (scan_emlx_corpus의 headers_only 모드 작업 단위)
+    본문과 plist는 반환된 LazyEmlx에서 필요할 때 읽는다.
+    """
+    if os.path.getsize(path) == 0:
+        return path, None, None
+    return path, LazyEmlx(path), None
+
+
+def parse_emlx_file(path: str) -> Tuple[str, Optional[Message], Optional[dict]]:
+    """
+    .emlx 파일을 mmap으로 열어 파싱한다. (프로세스 풀에서 실행되는 작업 단위)
+
+    Returns:
+        (path, parsed_email, plist_dict): 빈 파일이면 parsed_email은 None
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return path, None, None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            parsed_email, plist_dict = parse_emlx(mm)
+    return path, parsed_email, plist_dict
+
+
+def _seen_path_for(seen_path: str, headers_only: bool) -> str:
+    """
+    헤더만 읽은 파일을 전체 파싱 스캔에서 건너뛰지 않도록, 모드마다 다른 seen 파일을 사용한다.
+    """
+    if not headers_only:
+        return seen_path
+    return os.path.splitext(seen_path)[0] + ".headers.json"
+
+
+def _load_seen(seen_path: str) -> dict:
+    if seen_path and os.path.exists(seen_path):
+        with open(seen_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_seen(seen: dict, seen_path: str):
+    os.makedirs(os.path.dirname(seen_path), exist_ok=True)
+    tmp_path = seen_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(seen, f)
+    os.replace(tmp_path, seen_path)
+
+
+def scan_emlx_corpus(
+    root: str = MAIL_ROOT_DIRECTORY,
+    max_workers: Optional[int] = None,
+    seen_path: Optional[str] = EMLX_SEEN_PATH,
+    headers_only: bool = False,
+) -> Iterator[Tuple[str, Message, Optional[dict]]]:
+    """
+    Apple Mail V10 디렉토리 전체의 .emlx 파일을 프로세스 풀에서 병렬로 파싱하여
+    (path, parsed_email, plist_dict)를 완료되는 순서대로 반환한다.
+
+    - inode / mtime이 이전 실행과 같은 파일은 건너뛴다. (seen_path=None이면 항상 전체 스캔)
+      파일은 호출한 쪽이 처리를 마치고 다음 항목을 요청할 때 seen에 기록되므로, 처리 도중 중단되면 다음 실행에서 다시 반환된다.
+    - 동시에 제출하는 작업 수를 제한하여 메일이 많아도 메모리 사용량이 일정하다.
+    - headers_only=True이면 헤더만 파싱한 LazyEmlx를 반환한다. (plist는 None, 필요하면 .plist로 접근)
+      이 모드의 seen 기록은 전체 파싱 모드와 따로 저장된다.
+    """
+    seen_path = _seen_path_for(seen_path, headers_only) if seen_path else None
+    seen = _load_seen(seen_path) if seen_path else {}
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * 4
+    parse = parse_emlx_headers if headers_only else parse_emlx_file
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def drain(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                path, signature = pending.pop(future)
+                try:
+                    _, parsed_email, plist_dict = future.result()
+                except Exception as e:
+                    logging.warning(f"Failed to parse {path}: {e}")
+                    continue
+                if parsed_email is not None:
+                    yield path, parsed_email, plist_dict
+                # 호출한 쪽이 처리를 마친 뒤에 기록
+                seen[path] = signature
+
+        try:
+            for path, stat in iter_emlx_paths(root):
+                signature = [stat.st_ino, stat.st_mtime_ns]
+                if seen.get(path) == signature:
+                    continue
+                if len(pending) >= max_pending:
+                    yield from drain(FIRST_COMPLETED)
+                pending[executor.submit(parse, path)] = (path, signature)
+
+            while pending:
+                yield from drain(FIRST_COMPLETED)
+        finally:
+            if seen_path:
+                _save_seen(seen, seen_path)
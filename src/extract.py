@@ -1,35 +1,347 @@
-from common.types.types import Events
-from src.llm_wrapper.gemini.inference import run_gemini
-from src.utils.utils import async_wrapper
-
-import asyncio
-
-def extract_events(mails: list[dict], batch_size: int = 5) -> list[dict]:
-    """
-    메일 리스트를 배치 단위로 처리하여 이벤트를 추출합니다.
-    """
-    processed_mails = []
-    
-    # 배치 단위로 처리
-    for i in range(0, len(mails), batch_size):
-        batch, async_task = mails[i:i + batch_size], []
-        for mail in batch:
-            async_task.append(
-                run_gemini(
-                    target_prompt=str(mail.__dict__),
-                    prompt_in_path="extract.json",
-                    output_structure=Events,
-                    model="gemini-2.0-flash"
+from collections import deque
+from typing import Optional
+from common.types.types import Events, Mail, PackedEvents
+from src.cache import ExtractionCache, make_cache_key
+from src.store import make_mail_id
+from src.dedup import MailDeduplicator, copy_events
+from src.llm_wrapper.client import run_llm, get_provider, closing_providers
+from src.utils.utils import aiter_items
+from src.utils.ratelimit import estimate_tokens
+from src.utils.metrics import metrics
+
+import asyncio, logging
+
+EXTRACT_PROMPT = "extract.json"
+EXTRACT_PACKED_PROMPT = "extract_packed.json"
+# 한 번의 요청에 묶을 수 있는 최대 메일 수 (출력이 너무 길어지지 않도록 제한)
+PACK_MAX_MAILS = 20
+# 앞의 provider가 실패하거나 느리면 다음 provider로 failover
+EXTRACT_PROVIDERS = ("gemini", "gpt")
+
+
+def build_mail_prompt(mail: Mail) -> str:
+    """
+    LLM에 전달할 메일 내용을 문자열로 만듭니다.
+    rowid처럼 메일 내용과 무관한 필드는 제외하여 캐시 키가 내용에만 의존하도록 합니다.
+    전처리된 본문(body)이 있으면 원본 summary 대신 body만 보냅니다.
+    """
+    exclude = {"events", "rowid", "duplicate_of", "summary" if mail.body is not None else "body"}
+    return str(mail.model_dump(exclude=exclude))
+
+
+def _extract_models() -> list[str]:
+    """
+    EXTRACT_PROVIDERS의 모델 이름을 우선순위 순으로 반환합니다. (캐시 조회 순서)
+    """
+    return [get_provider(name).model for name in EXTRACT_PROVIDERS]
+
+
+async def _extract_mail_events(mail: Mail, cache: Optional[ExtractionCache] = None) -> Mail:
+    """
+    메일 하나에 대해 LLM을 호출하여 이벤트를 추출합니다.
+    cache가 주어지면 요청 전에 기본 provider, fallback provider 모델의 캐시를 차례로 조회하고,
+    요청 후 실제로 응답한 모델의 키로 결과를 저장합니다.
+    """
+    target_prompt = build_mail_prompt(mail)
+
+    if cache is not None:
+        cached = cache.get(*(make_cache_key(model, EXTRACT_PROMPT, Events, target_prompt) for model in _extract_models()))
+        if cached is not None:
+            logging.info(f"[CACHE] hit: {mail.subject}")
+            mail.events = Events.model_validate_json(cached)
+            return mail
+
+    response = await run_llm(
+        target_prompt=target_prompt,
+        prompt_in_path=EXTRACT_PROMPT,
+        output_structure=Events,
+        providers=EXTRACT_PROVIDERS,
+    )
+    events = response.parsed
+    mail.events = events
+
+    if cache is not None and events is not None:
+        cache.set(make_cache_key(response.model, EXTRACT_PROMPT, Events, target_prompt), events.model_dump_json())
+    return mail
+
+
+def build_packed_prompt(mails: list[Mail]) -> str:
+    """
+    여러 메일을 <mail id="..."> 태그로 감싸 하나의 프롬프트로 만듭니다. id는 pack 내 순번입니다.
+    """
+    return "\n".join(
+        f'<mail id="{mail_id}">\n{build_mail_prompt(mail)}\n</mail>' for mail_id, mail in enumerate(mails)
+    )
+
+
+class MailPacker:
+    """
+    들어오는 메일을 예상 토큰 수가 token_budget을 넘지 않도록 묶습니다.
+    """
+
+    def __init__(self, token_budget: int, max_mails: int = PACK_MAX_MAILS):
+        self.token_budget = token_budget
+        self.max_mails = max_mails
+        self.mails = []
+        self.tokens = 0
+
+    def add(self, mail: Mail) -> Optional[list[Mail]]:
+        """
+        메일을 추가합니다. 이 메일을 넣으면 예산을 넘는 경우, 기존 pack을 먼저 반환합니다.
+        """
+        tokens = estimate_tokens(build_mail_prompt(mail))
+        full_pack = None
+        if self.mails and (self.tokens + tokens > self.token_budget or len(self.mails) >= self.max_mails):
+            full_pack = self.flush()
+        self.mails.append(mail)
+        self.tokens += tokens
+        return full_pack
+
+    def flush(self) -> list[Mail]:
+        pack, self.mails, self.tokens = self.mails, [], 0
+        return pack
+
+
+def pack_mails(mails: list[Mail], token_budget: int) -> list[list[Mail]]:
+    """
+    메일 리스트를 token_budget 이하의 pack들로 나눕니다.
+    예산보다 큰 메일은 혼자 하나의 pack이 됩니다.
+    """
+    packer, packs = MailPacker(token_budget), []
+    for mail in mails:
+        pack = packer.add(mail)
+        if pack:
+            packs.append(pack)
+    if packer.mails:
+        packs.append(packer.flush())
+    return packs
+
+
+async def _extract_packed_events(mails: list[Mail], cache: Optional[ExtractionCache] = None) -> list[Mail]:
+    """
+    여러 메일의 이벤트를 한 번의 요청으로 추출합니다.
+    - 캐시에 있는 메일은 요청에서 제외합니다.
+    - 응답에서 빠진 메일은 개별 요청으로 다시 추출합니다.
+    """
+    models = _extract_models()
+
+    targets, target_prompts = [], {}
+    for mail in mails:
+        if cache is not None:
+            target_prompt = build_mail_prompt(mail)
+            # 개별 요청으로 추출된 결과가 있으면 그것도 재사용
+            cached = cache.get(*(
+                make_cache_key(model, prompt_in_path, Events, target_prompt)
+                for model in models
+                for prompt_in_path in (EXTRACT_PACKED_PROMPT, EXTRACT_PROMPT)
+            ))
+            if cached is not None:
+                mail.events = Events.model_validate_json(cached)
+                continue
+            target_prompts[id(mail)] = target_prompt
+        targets.append(mail)
+
+    if len(targets) == 1:
+        await _extract_mail_events(targets[0], cache)
+        return mails
+
+    if targets:
+        response = await run_llm(
+            target_prompt=build_packed_prompt(targets),
+            prompt_in_path=EXTRACT_PACKED_PROMPT,
+            output_structure=PackedEvents,
+            providers=EXTRACT_PROVIDERS,
+        )
+        results = {result.mail_id: result.events for result in response.parsed.results} if response.parsed else {}
+
+        missing = []
+        for mail_id, mail in enumerate(targets):
+            events = results.get(mail_id)
+            if events is None:
+                missing.append(mail)
+                continue
+            mail.events = events
+            if cache is not None:
+                cache_key = make_cache_key(response.model, EXTRACT_PACKED_PROMPT, Events, target_prompts[id(mail)])
+                cache.set(cache_key, events.model_dump_json())
+
+        if missing:
+            logging.warning(f"[PACK] {len(missing)}/{len(targets)} mails missing in packed response, retrying individually")
+            await asyncio.gather(*[_extract_mail_events(mail, cache) for mail in missing])
+
+    return mails
+
+
+async def _extract_jobs(mails, cache: Optional[ExtractionCache], pack_token_budget: Optional[int]):
+    """
+    메일을 요청 단위로 묶어 (메일 리스트, coroutine)을 반환합니다. 각 coroutine은 처리된 메일 리스트를 반환합니다.
+    """
+    async def single(mail):
+        return [await _extract_mail_events(mail, cache)]
+
+    packer = MailPacker(pack_token_budget) if pack_token_budget else None
+    async for mail in aiter_items(mails):
+        if packer is None:
+            yield [mail], single(mail)
+            continue
+        pack = packer.add(mail)
+        if pack:
+            yield pack, _extract_packed_events(pack, cache)
+
+    if packer is not None and packer.mails:
+        pack = packer.flush()
+        yield pack, _extract_packed_events(pack, cache)
+
+
+async def _run_job(mails: list[Mail], job) -> list[Mail]:
+    """
+    요청 단위 실행 시간과 동시에 진행 중인 요청 수를 기록합니다.
+    모든 provider가 실패하는 등 요청이 실패하면 전체 스트림을 멈추지 않고,
+    해당 메일들의 events를 None(추출 실패)으로 두고 extract_failures_total에 기록한 뒤 반환합니다.
+    """
+    with metrics.stage("extract"), metrics.in_flight("extract_jobs_in_flight"):
+        try:
+            mails = await job
+        except Exception as e:
+            logging.error(f"[EXTRACT] Failed for {len(mails)} mails ({type(e).__name__}: {e}): {[mail.subject for mail in mails]}")
+            metrics.inc("extract_failures_total", len(mails), error=type(e).__name__)
+            for mail in mails:
+                mail.events = None
+            return mails
+    metrics.inc("pipeline_mails_total", len(mails), stage="extract")
+    return mails
+
+
+async def _dedup_mails(mails, dedup: MailDeduplicator, followers: dict, ready: deque):
+    """
+    대표 메일만 추출 단계로 넘깁니다.
+    - 추출 중인 대표 메일의 중복은 followers에 모아 두었다가 대표 메일이 끝날 때 함께 반환하고,
+    - 이미 추출이 끝난 대표 메일의 중복은 결과를 복사하여 ready에 넣습니다.
+    """
+    async for mail in aiter_items(mails):
+        key = dedup.add(mail)
+        if key is None:
+            followers[make_mail_id(mail)] = []
+            yield mail
+        elif dedup.is_resolved(key):
+            ready.append(dedup.copy_events(key, mail))
+        else:
+            followers.setdefault(key, []).append(mail)
+
+
+def _completed_mails(done, followers: dict, dedup: Optional[MailDeduplicator]) -> list[Mail]:
+    """
+    완료된 요청의 메일과, 그 메일을 대표로 하는 중복 메일들을 반환합니다.
+    """
+    mails = []
+    for task in done:
+        for mail in task.result():
+            mails.append(mail)
+            if dedup is None:
+                continue
+            dedup.resolve(mail)
+            mails.extend(copy_events(mail, follower) for follower in followers.pop(make_mail_id(mail), ()))
+    return mails
+
+
+async def iter_extract_events(
+    mails,
+    concurrency: int = 5,
+    cache: Optional[ExtractionCache] = None,
+    pack_token_budget: Optional[int] = None,
+    dedup: Optional[MailDeduplicator] = None,
+):
+    """
+    항상 최대 concurrency개의 요청이 진행 중이도록 유지하면서(sliding window),
+    이벤트 추출이 끝난 메일을 완료 순서대로 반환하는 비동기 제너레이터입니다.
+    mails는 일반 iterable 또는 async iterable 모두 가능하며, 슬롯이 빌 때만 다음 메일을 가져오므로
+    상류(fetch/parse) 단계에 자연스럽게 backpressure가 걸립니다.
+    pack_token_budget이 주어지면 짧은 메일 여러 개를 예산 안에서 한 요청으로 묶습니다.
+    dedup이 주어지면 재공지·리마인더처럼 거의 같은 메일은 한 번만 추출하고 결과를 복사합니다.
+    """
+    followers, ready = {}, deque()
+    if dedup is not None:
+        mails = _dedup_mails(mails, dedup, followers, ready)
+
+    pending, job = set(), None
+    jobs = _extract_jobs(mails, cache, pack_token_budget)
+    try:
+        async for batch, job in jobs:
+            while ready:
+                yield ready.popleft()
+            # 슬롯이 가득 찼으면 하나라도 끝날 때까지 대기
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for mail in _completed_mails(done, followers, dedup):
+                    yield mail
+            pending.add(asyncio.create_task(_run_job(batch, job)))
+            job = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for mail in _completed_mails(done, followers, dedup):
+                yield mail
+        while ready:
+            yield ready.popleft()
+    finally:
+        # 상류·하류의 예외나 중단으로 제너레이터가 닫히면, 진행 중인 요청을 취소하고 끝날 때까지 기다림
+        # (그래야 이후 aclose_providers가 사용 중인 클라이언트를 닫지 않음)
+        if job is not None:
+            # 가져왔지만 아직 시작하지 않은 요청
+            job.close()
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        await jobs.aclose()
+
+
+async def async_extract_events(
+    mails: list[Mail],
+    concurrency: int = 5,
+    cache: Optional[ExtractionCache] = None,
+    pack_token_budget: Optional[int] = None,
+    dedup: Optional[MailDeduplicator] = None,
+) -> list[Mail]:
+    """
+    하나의 이벤트 루프 안에서 메일 리스트의 이벤트를 추출합니다.
+    """
+    processed_count = 0
+    async for mail in iter_extract_events(
+        mails, concurrency=concurrency, cache=cache, pack_token_budget=pack_token_budget, dedup=dedup
+    ):
+        logging.info(f"MAIL {processed_count} events: {mail.events}")
+        processed_count += 1
+    return mails
+
+
+def extract_events(
+    mails: list[Mail],
+    batch_size: int = 5,
+    use_cache: bool = True,
+    pack_token_budget: Optional[int] = None,
+    dedup: bool = True,
+) -> list[Mail]:
+    """
+    메일 리스트에서 이벤트를 추출합니다.
+    batch_size는 동시에 진행할 최대 요청 수(in-flight)로 사용되며,
+    use_cache가 True이면 로컬 캐시에 저장된 추출 결과를 재사용합니다.
+    pack_token_budget이 주어지면 여러 메일을 한 요청으로 묶어 보냅니다.
+    dedup이 True이면 거의 같은 메일은 한 번만 추출합니다.
+    """
+    cache = ExtractionCache() if use_cache else None
+    try:
+        return asyncio.run(
+            closing_providers(
+                async_extract_events(
+                    mails,
+                    concurrency=batch_size,
+                    cache=cache,
+                    pack_token_budget=pack_token_budget,
+                    dedup=MailDeduplicator() if dedup else None,
                 )
             )
-        main_events = asyncio.run(async_wrapper(async_task))
-        
-        # 각 메일에 이벤트 정보 업데이트
-        for mail, event in zip(batch, main_events):
-            mail.events = event[0]
-            print(f"MAIL {len(processed_mails)}")
-            print(f"events: {mail.events}\n")
-        
-        processed_mails.extend(batch)
-        
-    return processed_mails
+        )
+    finally:
+        if cache is not None:
+            cache.close()
@@ -1,43 +1,293 @@
-import sqlite3, os, logging, datetime
-from common.config.config import MAIL_DIRECTORY
+from typing import Optional, Sequence
+from urllib.parse import quote
+from common.config.config import MAIL_DIRECTORY, MAIL_DB_MODE, CACHE_DIRECTORY
+from src.mail_filter import MailFilter, load_mail_filter
 
-def fetch_mails_from_apple_mail(end_date:datetime.datetime=None, days:int=7):
+import sqlite3, os, logging, datetime, json, threading
+
+FETCH_STATE_PATH = os.path.join(CACHE_DIRECTORY, "fetch_state.json")
+# snapshot 모드에서 Envelope Index 복사본을 저장하는 위치
+ENVELOPE_SNAPSHOT_PATH = os.path.join(CACHE_DIRECTORY, "envelope_index_snapshot.sqlite3")
+
+# 메일 조회 시 공통으로 사용하는 SELECT / JOIN 구문
+MAIL_SELECT_QUERY = """
+    SELECT
+        s.subject,
+        sm.summary,
+        a.address,
+        datetime(m.date_received, 'unixepoch') AS date_received,
+        m.ROWID
+    FROM messages m
+    JOIN addresses a ON m.sender = a.rowid
+    JOIN subjects s ON m.subject = s.ROWID
+    JOIN summaries sm ON m.summary = sm.ROWID
+"""
+
+
+class EnvelopeIndexReader:
+    """
+    Apple Mail의 Envelope Index를 읽기 전용으로 여는 리더입니다.
+    - 항상 file:...?mode=ro URI로 열어 Mail.app의 쓰기를 막지 않습니다. (MAIL_DB_MODE 참고)
+    - 스레드마다 연결을 하나씩 만들어 재사용합니다.
+    - snapshot 모드에서는 조회할 때마다 원본의 mtime / 크기를 확인하여, 바뀌었으면 복사본을 다시 만듭니다.
+    """
+
+    def __init__(self, db_path: str = MAIL_DIRECTORY, mode: str = MAIL_DB_MODE, snapshot_path: str = ENVELOPE_SNAPSHOT_PATH):
+        if mode not in ("ro", "immutable", "snapshot"):
+            raise ValueError(f"Unknown Envelope Index mode: {mode}")
+        self.db_path = os.path.expanduser(db_path)
+        self.mode = mode
+        self.snapshot_path = snapshot_path
+        self._local = threading.local()
+        self._snapshot_lock = threading.Lock()
+        # 마지막 snapshot을 만들 때 원본(DB, WAL)의 (mtime, 크기)와, snapshot을 만들 때마다 증가하는 번호
+        self._snapshot_signature = None
+        self._snapshot_generation = 0
+
+    @staticmethod
+    def _uri(path: str, immutable: bool) -> str:
+        return f"file:{quote(os.path.abspath(path))}?mode=ro" + ("&immutable=1" if immutable else "")
+
+    def _source_signature(self) -> tuple:
+        """
+        원본 DB와 WAL 파일의 (mtime, 크기)입니다. 새 메일은 WAL에만 먼저 기록될 수 있으므로 함께 확인합니다.
+        """
+        signature = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _take_snapshot(self):
+        signature = self._source_signature()
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        source = sqlite3.connect(self._uri(self.db_path, immutable=False), uri=True)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_signature = signature
+        self._snapshot_generation += 1
+
+    def refresh_snapshot(self):
+        """
+        백업 API로 Envelope Index의 일관된 복사본을 만듭니다. (WAL에만 있는 최신 변경도 포함)
+        이미 열린 연결은 읽던 조회가 끝날 수 있도록 그대로 두고, 다음 조회부터 새 복사본을 엽니다.
+        """
+        with self._snapshot_lock:
+            self._take_snapshot()
+
+    def _ensure_snapshot(self):
+        """
+        원본이 마지막 snapshot 이후 바뀌었으면 (Mail.app이 새 메일을 받은 경우 등) 다시 복사합니다.
+        """
+        if self._snapshot_signature == self._source_signature():
+            return
+        with self._snapshot_lock:
+            if self._snapshot_signature != self._source_signature():
+                self._take_snapshot()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.mode == "snapshot":
+            uri = self._uri(self.snapshot_path, immutable=True)
+        else:
+            uri = self._uri(self.db_path, immutable=self.mode == "immutable")
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA cache_size = -65536")  # 64MB
+        conn.execute("PRAGMA mmap_size = 268435456")  # 256MB
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        generation = 0
+        if self.mode == "snapshot":
+            self._ensure_snapshot()
+            generation = self._snapshot_generation
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "generation", 0) != generation:
+            # 이전 snapshot의 연결은 닫지 않음 (진행 중인 cursor가 참조를 유지하며, 끝나면 함께 정리됨)
+            conn = self._local.conn = self._connect()
+            self._local.generation = generation
+        return conn
+
+    def execute(self, query: str, params: Sequence = ()) -> sqlite3.Cursor:
+        return self.conn.execute(query, params)
+
+    def close(self):
+        """
+        현재 스레드의 연결을 닫습니다. 다음 조회 때 다시 연결합니다.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_readers: dict = {}
+_readers_lock = threading.Lock()
+
+
+def get_envelope_reader(db_path: str = MAIL_DIRECTORY, mode: str = MAIL_DB_MODE) -> EnvelopeIndexReader:
+    """
+    (경로, 모드)마다 하나의 리더를 만들어 재사용합니다.
+    """
+    key = (os.path.expanduser(db_path), mode)
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is None:
+            reader = _readers[key] = EnvelopeIndexReader(db_path, mode)
+        return reader
+
+
+def iter_mails_from_apple_mail(
+    end_date:datetime.datetime=None,
+    days:int=7,
+    chunk_size:int=100,
+    mail_filter:Optional[MailFilter]=None,
+    reader:Optional[EnvelopeIndexReader]=None,
+):
+    """
+    [end_date - days, end_date] 구간에서 mail_filter에 맞는 메일을 chunk_size개씩 읽어 한 행씩 반환하는 제너레이터입니다.
+    전체 결과를 메모리에 올리지 않으므로 긴 기간을 백필할 때도 메모리 사용량이 일정합니다.
+    모든 조건은 SQL로 거르며, 날짜는 미리 계산한 epoch 정수로 바인딩하여 date_received 인덱스를 그대로 사용합니다.
+    mail_filter가 없으면 load_mail_filter()의 설정을 사용합니다.
+    """
+    # end_date가 None이면 현재 시간을 사용
+    if end_date is None:
+        end_date = datetime.datetime.now()
+    # days를 이용해 시작 날짜 계산
+    start_date = end_date - datetime.timedelta(days=days)
+
+    reader = reader or get_envelope_reader()
+    where, params = (mail_filter or load_mail_filter()).between(start_date, end_date).compile()
     try:
-        # end_date가 None이면 현재 시간을 사용
-        if end_date is None:
-            end_date = datetime.datetime.now()
-        # days를 이용해 시작 날짜 계산
-        start_date = end_date - datetime.timedelta(days=days)
-        
-        # SQLite DB 연결
-        db_path = os.path.expanduser(MAIL_DIRECTORY)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # Apple Mail에서 교내회보 필터링
-        cursor.execute("""
-            SELECT 
-                s.subject,
-                sm.summary,
-                a.address,
-                datetime(m.date_received, 'unixepoch') AS date_received
-            FROM messages m
-            JOIN addresses a ON m.sender = a.rowid 
-            JOIN subjects s ON m.subject = s.ROWID
-            JOIN summaries sm ON m.summary = sm.ROWID
-            WHERE a.address = 'noreply@postech.ac.kr'
-              AND m.date_received >= strftime('%s', ?)
-              AND m.date_received <= strftime('%s', ?)
+        cursor = reader.execute(MAIL_SELECT_QUERY + f"""
+            WHERE {where}
             ORDER BY m.date_received;
-        """, (start_date.strftime('%Y-%m-%d %H:%M:%S'), 
-              end_date.strftime('%Y-%m-%d %H:%M:%S')))
-        
-        mails = cursor.fetchall()
-        logging.info(f"📩 Total number of mails from noreply@postech.ac.kr between {start_date} and {end_date}: {len(mails)}")
+        """, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    except sqlite3.Error as e:
+        logging.error(f"SQLite error: {e}")
+        raise e
+
+
+def fetch_mails_from_apple_mail(
+    end_date:datetime.datetime=None,
+    days:int=7,
+    mail_filter:Optional[MailFilter]=None,
+):
+    if end_date is None:
+        end_date = datetime.datetime.now()
+    start_date = end_date - datetime.timedelta(days=days)
+
+    mails = list(iter_mails_from_apple_mail(end_date=end_date, days=days, mail_filter=mail_filter))
+    logging.info(f"📩 Total number of mails between {start_date} and {end_date}: {len(mails)}")
+    return mails
+
 
-        conn.close()
-        return mails
+def load_fetch_state(state_path: str = FETCH_STATE_PATH) -> dict:
+    """
+    마지막으로 처리한 메일의 위치(high-water mark)를 불러옵니다.
+    저장된 상태가 없으면 last_rowid가 0인 초기 상태를 반환합니다.
+    """
+    if not os.path.exists(state_path):
+        return {"last_rowid": 0, "last_date_received": None}
+    with open(state_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_fetch_state(last_rowid: int, last_date_received: str, state_path: str = FETCH_STATE_PATH):
+    """
+    high-water mark를 저장합니다.
+    임시 파일에 쓴 뒤 교체하므로, 저장 도중 중단되어도 이전 상태가 보존됩니다.
+    """
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"last_rowid": last_rowid, "last_date_received": last_date_received}, file)
+    os.replace(tmp_path, state_path)
+
+
+def iter_new_mails_from_apple_mail(
+    days:int=7,
+    limit:int=None,
+    state_path:str=FETCH_STATE_PATH,
+    mail_filter:Optional[MailFilter]=None,
+    reader:Optional[EnvelopeIndexReader]=None,
+    chunk_size:int=100,
+):
+    """
+    저장된 high-water mark 이후에 도착한 메일 중 mail_filter에 맞는 메일만 ROWID 순으로 chunk_size개씩 읽어
+    한 행씩 반환하는 제너레이터입니다. (iter_mails_from_apple_mail처럼 메모리 사용량이 일정)
+    - 상태가 없으면 최근 days일 이내의 메일부터 시작합니다.
+    - 상태는 자동으로 갱신되지 않습니다. 하위 단계 처리가 끝난 뒤 save_fetch_state()로
+      마지막 메일의 ROWID를 저장해야, 중간에 실패해도 다음 실행에서 이어서 처리할 수 있습니다.
+      (run_pipeline에 state_path를 넘기면 자동으로 저장)
+    """
+    state = load_fetch_state(state_path)
+    last_rowid = state["last_rowid"]
+
+    mail_filter = mail_filter or load_mail_filter()
+    if last_rowid == 0:
+        mail_filter = mail_filter.between(start=datetime.datetime.now() - datetime.timedelta(days=days))
+    where, params = mail_filter.compile()
+    query = MAIL_SELECT_QUERY + f"""
+        WHERE {where}
+          AND m.ROWID > ?
+        ORDER BY m.ROWID
+    """
+    params.append(last_rowid)
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    reader = reader or get_envelope_reader()
+    count = 0
+    try:
+        cursor = reader.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+        finally:
+            cursor.close()
 
     except sqlite3.Error as e:
         logging.error(f"SQLite error: {e}")
         raise e
+    logging.info(f"📩 Number of new mails after ROWID {last_rowid}: {count}")
+
+
+def fetch_new_mails_from_apple_mail(
+    days:int=7,
+    limit:int=None,
+    state_path:str=FETCH_STATE_PATH,
+    mail_filter:Optional[MailFilter]=None,
+    reader:Optional[EnvelopeIndexReader]=None,
+):
+    """
+    iter_new_mails_from_apple_mail의 결과를 리스트로 반환합니다.
+    """
+    return list(iter_new_mails_from_apple_mail(
+        days=days, limit=limit, state_path=state_path, mail_filter=mail_filter, reader=reader
+    ))
@@ -0,0 +1,291 @@
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+from common.config.config import (
+    CACHE_DIRECTORY,
+    GRAPH_CLIENT_ID,
+    GRAPH_TENANT_ID,
+    GRAPH_BASE_URL,
+    GRAPH_SCOPES,
+    GRAPH_MAIL_FOLDER,
+    GRAPH_PAGE_SIZE,
+    GRAPH_ALLOW_UNENCRYPTED_TOKEN_CACHE,
+)
+from src.mail_filter import MailFilter, load_mail_filter, to_epoch
+from src.utils.decorator import parse_retry_after
+
+import os, json, time, asyncio, logging, threading
+import httpx
+
+GRAPH_AUTH_RECORD_PATH = os.path.join(CACHE_DIRECTORY, "graph_auth_record.json")
+GRAPH_DELTA_STATE_PATH = os.path.join(CACHE_DIRECTORY, "graph_delta_state.json")
+
+# 메일 행 생성에 필요한 필드만 요청
+GRAPH_SELECT_FIELDS = "id,subject,from,receivedDateTime,body,isRead,flag"
+# 만료 이 시간(초) 전에 토큰을 갱신
+TOKEN_REFRESH_MARGIN = 300
+GRAPH_MAX_ATTEMPTS = 5
+
+
+def build_device_code_credential(
+    client_id: str = GRAPH_CLIENT_ID,
+    tenant_id: str = GRAPH_TENANT_ID,
+    record_path: str = GRAPH_AUTH_RECORD_PATH,
+):
+    """
+    기기 코드 흐름 credential을 만듭니다.
+    토큰은 azure-identity의 영구 캐시에 저장되고, 로그인 정보(AuthenticationRecord)는 record_path에 저장되어
+    다음 실행부터는 다시 로그인하지 않고 refresh token으로 갱신합니다.
+    """
+    from azure.identity import AuthenticationRecord, DeviceCodeCredential, TokenCachePersistenceOptions
+
+    record = None
+    if os.path.exists(record_path):
+        with open(record_path, "r", encoding="utf-8") as file:
+            record = AuthenticationRecord.deserialize(file.read())
+
+    credential = DeviceCodeCredential(
+        client_id=client_id,
+        tenant_id=tenant_id,
+        authentication_record=record,
+        cache_persistence_options=TokenCachePersistenceOptions(
+            name="posplexity", allow_unencrypted_storage=GRAPH_ALLOW_UNENCRYPTED_TOKEN_CACHE
+        ),
+    )
+    if record is None:
+        record = credential.authenticate(scopes=GRAPH_SCOPES)
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        with open(record_path, "w", encoding="utf-8") as file:
+            file.write(record.serialize())
+    return credential
+
+
+class GraphTokenProvider:
+    """
+    credential.get_token() 결과를 만료 직전까지 메모리에 캐시합니다.
+    credential은 azure-identity의 TokenCredential처럼 get_token(*scopes)을 가진 객체면 됩니다.
+    """
+
+    def __init__(self, credential, scopes: list[str] = GRAPH_SCOPES):
+        self.credential = credential
+        self.scopes = scopes
+        self._token = None
+        self._lock = threading.Lock()
+
+    def get(self, force_refresh: bool = False) -> str:
+        with self._lock:
+            if force_refresh or self._token is None or self._token.expires_on - TOKEN_REFRESH_MARGIN <= time.time():
+                self._token = self.credential.get_token(*self.scopes)
+            return self._token.token
+
+
+def load_delta_state(state_path: str = GRAPH_DELTA_STATE_PATH) -> dict:
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_delta_state(state: dict, state_path: str = GRAPH_DELTA_STATE_PATH):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(tmp_path, state_path)
+
+
+def _parse_graph_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _graph_datetime(value: datetime) -> str:
+    """
+    Envelope Index와 같이 시간대 없는 datetime은 UTC로 보고 OData 형식으로 바꿉니다.
+    """
+    return datetime.fromtimestamp(to_epoch(value), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class GraphMailSource:
+    """
+    Microsoft Graph로 메일을 가져옵니다. Apple Mail fetcher와 같은 행 형식
+    (subject, summary, sender, date_received, rowid)을 반환하므로 run_pipeline에 그대로 넘길 수 있습니다.
+    - $select로 필요한 필드만 받고, 본문은 text 형식으로 받아 summary로 사용합니다.
+    - 서버 페이징(@odata.nextLink)을 따라가며 한 페이지씩 읽습니다.
+    - iter_delta()는 /delta로 지난 실행 이후 바뀐 메일만 가져옵니다.
+    - 요청과 throttling 대기는 비동기(httpx.AsyncClient, asyncio.sleep)로 하여 진행 중인 LLM 추출을 막지 않습니다.
+    - Graph 메일 ID는 정수가 아니므로 rowid는 None입니다.
+    """
+
+    def __init__(
+        self,
+        credential=None,
+        base_url: str = GRAPH_BASE_URL,
+        folder: str = GRAPH_MAIL_FOLDER,
+        page_size: int = GRAPH_PAGE_SIZE,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.tokens = GraphTokenProvider(credential or build_device_code_credential())
+        self.base_url = base_url.rstrip("/")
+        self.folder = folder
+        self.page_size = page_size
+        self._client = client
+        self._owns_client = client is None
+        self.pending_delta_link = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 이벤트 루프 안에서 처음 사용할 때 생성
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30)
+        return self._client
+
+    async def aclose(self):
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        GET 요청을 보냅니다. 401이면 토큰을 갱신하고, 429/503/504면 Retry-After만큼 기다린 뒤 재시도합니다.
+        """
+        force_refresh = False
+        for attempt in range(1, GRAPH_MAX_ATTEMPTS + 1):
+            # 토큰 갱신은 네트워크 요청을 할 수 있는 동기 호출이므로 스레드에서 실행
+            token = await asyncio.to_thread(self.tokens.get, force_refresh)
+            response = await self.client.get(
+                url,
+                params=params,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Prefer": f'outlook.body-content-type="text", odata.maxpagesize={self.page_size}',
+                },
+            )
+            if attempt < GRAPH_MAX_ATTEMPTS:
+                if response.status_code in (429, 503, 504):
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                    delay = 2 ** attempt if delay is None else delay
+                    logging.warning(f"[GRAPH] {response.status_code}, retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                if response.status_code == 401 and not force_refresh:
+                    force_refresh = True
+                    continue
+            response.raise_for_status()
+            return response.json()
+
+    async def _iter_pages(self, url: str, params: Optional[dict] = None) -> AsyncIterator[dict]:
+        while url:
+            page = await self._get(url, params)
+            # nextLink / deltaLink에는 쿼리가 이미 포함되어 있음
+            params = None
+            yield page
+            url = page.get("@odata.nextLink")
+
+    @staticmethod
+    def to_row(message: dict) -> tuple:
+        sender = ((message.get("from") or {}).get("emailAddress") or {}).get("address", "")
+        received = _parse_graph_datetime(message["receivedDateTime"]).astimezone(timezone.utc)
+        return (
+            message.get("subject") or "",
+            (message.get("body") or {}).get("content", ""),
+            sender,
+            received.strftime("%Y-%m-%d %H:%M:%S"),
+            None,
+        )
+
+    @staticmethod
+    def _matches(message: dict, mail_filter: MailFilter) -> bool:
+        return mail_filter.matches(
+            sender=((message.get("from") or {}).get("emailAddress") or {}).get("address", ""),
+            subject=message.get("subject") or "",
+            received=_parse_graph_datetime(message["receivedDateTime"]),
+            read=message.get("isRead"),
+            flagged=(message.get("flag") or {}).get("flagStatus") == "flagged" if "flag" in message else None,
+        )
+
+    async def iter_messages(
+        self, start: datetime, end: datetime, mail_filter: Optional[MailFilter] = None
+    ) -> AsyncIterator[tuple]:
+        """
+        [start, end] 구간에 받은 메일을 수신 시각 순으로 반환합니다.
+        날짜와 (정확히 일치하는) 발신자는 $filter로 서버에서 거르고, 나머지 조건은 받은 뒤 확인합니다.
+        """
+        mail_filter = (mail_filter or load_mail_filter()).between(start, end)
+        conditions = [
+            f"receivedDateTime ge {_graph_datetime(mail_filter.since)}",
+            f"receivedDateTime le {_graph_datetime(mail_filter.until)}",
+        ]
+        exact_senders = [s for s in mail_filter.senders if "*" not in s and "?" not in s]
+        if exact_senders and len(exact_senders) == len(mail_filter.senders):
+            conditions.append(
+                "(" + " or ".join(f"from/emailAddress/address eq '{s.replace(chr(39), chr(39) * 2)}'" for s in exact_senders) + ")"
+            )
+        params = {
+            "$select": GRAPH_SELECT_FIELDS,
+            "$filter": " and ".join(conditions),
+            "$orderby": "receivedDateTime asc",
+            "$top": self.page_size,
+        }
+        url = f"{self.base_url}/me/mailFolders/{self.folder}/messages"
+        async for page in self._iter_pages(url, params):
+            for message in page.get("value", []):
+                if self._matches(message, mail_filter):
+                    yield self.to_row(message)
+
+    async def iter_delta(
+        self, days: int = 7, mail_filter: Optional[MailFilter] = None, state_path: str = GRAPH_DELTA_STATE_PATH
+    ) -> AsyncIterator[tuple]:
+        """
+        지난 동기화 이후 추가·변경된 메일만 반환합니다. 상태가 없으면 최근 days일 이내의 메일부터 시작합니다.
+        삭제된 메일(@removed)은 건너뜁니다.
+        마지막 페이지의 deltaLink는 pending_delta_link에 보관되며, 하위 단계 처리가 끝난 뒤 commit()을 호출해야
+        저장됩니다. (중간에 실패하면 다음 실행에서 같은 변경분을 다시 받습니다)
+        """
+        mail_filter = mail_filter or load_mail_filter()
+        delta_link = load_delta_state(state_path).get(self.folder)
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            start = datetime.now(timezone.utc) - timedelta(days=days)
+            url = f"{self.base_url}/me/mailFolders/{self.folder}/messages/delta"
+            params = {"$select": GRAPH_SELECT_FIELDS, "$filter": f"receivedDateTime ge {_graph_datetime(start)}"}
+
+        async for page in self._iter_pages(url, params):
+            for message in page.get("value", []):
+                if "@removed" in message or "receivedDateTime" not in message:
+                    continue
+                if self._matches(message, mail_filter):
+                    yield self.to_row(message)
+            if "@odata.deltaLink" in page:
+                self.pending_delta_link = page["@odata.deltaLink"]
+
+    def commit(self, state_path: str = GRAPH_DELTA_STATE_PATH):
+        """
+        iter_delta()를 끝까지 읽은 뒤 받은 deltaLink를 저장합니다.
+        """
+        if self.pending_delta_link is None:
+            return
+        state = load_delta_state(state_path)
+        state[self.folder] = self.pending_delta_link
+        save_delta_state(state, state_path)
+        self.pending_delta_link = None
+
+
+async def iter_mails_from_graph(
+    end_date: datetime = None,
+    days: int = 7,
+    mail_filter: Optional[MailFilter] = None,
+    source: Optional[GraphMailSource] = None,
+) -> AsyncIterator[tuple]:
+    """
+    iter_mails_from_apple_mail과 같은 인자와 행 형식으로 Graph에서 메일을 가져옵니다. (async generator)
+    """
+    if end_date is None:
+        end_date = datetime.now()
+    owned = source is None
+    source = source or GraphMailSource()
+    try:
+        async for row in source.iter_messages(end_date - timedelta(days=days), end_date, mail_filter):
+            yield row
+    finally:
+        if owned:
+            await source.aclose()
@@ -0,0 +1,458 @@
+from typing import Optional, Sequence
+from weakref import WeakKeyDictionary
+from common.config.config import (
+    LLM_PROVIDERS,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_FAILOVER_TIMEOUT,
+    LLM_MAX_ATTEMPTS,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_TIMEOUT,
+    USD_TO_KRW,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_BATCH_SIZE,
+)
+from common.types.types import LLMResponse
+from src.llm_wrapper.prompt_registry import PromptTemplate, load_prompt
+from src.llm_wrapper.image import async_encode_image_bytes
+from src.utils.decorator import retry_async, get_status_code
+from src.utils.ratelimit import RateLimiter, CircuitBreaker, CircuitOpenError, estimate_tokens
+from src.utils.metrics import metrics, estimate_cost
+
+import asyncio, base64, logging, os, time
+import httpx, openai
+from google import genai
+from google.genai import errors as genai_errors
+
+
+def _loop_local(store: WeakKeyDictionary, factory):
+    """
+    현재 이벤트 루프마다 하나씩 객체를 만들어 재사용합니다.
+    (비동기 HTTP 클라이언트와 Semaphore는 생성된 루프에서만 사용할 수 있기 때문)
+    """
+    loop = asyncio.get_running_loop()
+    value = store.get(loop)
+    if value is None:
+        value = store[loop] = factory()
+    return value
+
+
+_http_clients = WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    OpenAI 호환 provider들이 공유하는 비동기 HTTP 커넥션 풀을 반환합니다.
+    """
+    return _loop_local(
+        _http_clients,
+        lambda: httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_FAILOVER_TIMEOUT, connect=10.0),
+        ),
+    )
+
+
+class LLMProvider:
+    """
+    모든 provider가 공유하는 비동기 호출 인터페이스입니다.
+    - generate()는 프롬프트와 pydantic 출력 스키마를 받아 LLMResponse를 반환합니다.
+    - provider별 동시 요청 수는 max_concurrency로, 분당 요청/토큰 수는 RateLimiter로 제한됩니다.
+    - rate limit·서버 오류는 backoff 후 재시도하고, 실패가 계속되면 circuit breaker가 열려
+      바로 다음 provider로 failover 됩니다.
+    - 클라이언트는 import 시점이 아니라 처음 사용할 때 생성됩니다.
+    """
+
+    # 이 예외가 발생하면 같은 provider로 재시도합니다.
+    retry_errors: tuple = (httpx.HTTPError, ConnectionError)
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        api_key_env: str,
+        max_concurrency: int,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        embedding_model: Optional[str] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.embedding_model = embedding_model
+        self.api_key_env = api_key_env
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.breaker = CircuitBreaker(name, LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_TIMEOUT)
+        self._semaphores = WeakKeyDictionary()
+        self._clients = WeakKeyDictionary()
+
+    @property
+    def failover_errors(self) -> tuple:
+        """
+        재시도 후에도 실패했거나, 응답이 너무 느리거나, circuit이 열린 경우 다음 provider로 넘어갑니다.
+        """
+        return self.retry_errors + (asyncio.TimeoutError, CircuitOpenError)
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.getenv(self.api_key_env)
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        return _loop_local(self._semaphores, lambda: asyncio.Semaphore(self.max_concurrency))
+
+    @property
+    def client(self):
+        return _loop_local(self._clients, self._build_client)
+
+    def _build_client(self):
+        raise NotImplementedError
+
+    async def _close_client(self, client):
+        raise NotImplementedError
+
+    async def aclose(self):
+        """
+        현재 이벤트 루프에서 만든 클라이언트를 닫습니다. 같은 루프에서 다시 사용하면 새로 만듭니다.
+        """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await self._close_client(client)
+
+    async def _generate(
+        self, prompt: PromptTemplate, target_prompt: str, output_structure, img_in_data, model: str
+    ) -> LLMResponse:
+        raise NotImplementedError
+
+    async def _embed(self, texts: list[str], model: str) -> list[list[float]]:
+        raise NotImplementedError
+
+    def _on_retry(self, e: Exception, attempt: int):
+        metrics.inc("llm_requests_total", provider=self.name, status="retry")
+        self.breaker.record_failure()
+        if get_status_code(e) == 429:
+            self.limiter.penalize()
+        logging.warning(f"[{self.name.upper()}] Attempt {attempt} failed ({type(e).__name__}: {e}), retrying")
+
+    async def _generate_once(self, prompt, target_prompt, output_structure, img_in_data, model, timeout, estimated_tokens):
+        trial = self.breaker.before_request()
+        try:
+            await self.limiter.acquire(estimated_tokens)
+            async with self.semaphore:
+                with metrics.in_flight("llm_requests_in_flight", provider=self.name):
+                    start_time = time.time()
+                    response = await asyncio.wait_for(
+                        self._generate(prompt, target_prompt, output_structure, img_in_data, model),
+                        timeout,
+                    )
+                    response.latency = time.time() - start_time
+        except BaseException as e:
+            # provider 오류는 _on_retry / generate()에서 실패로 기록됨. 그 외(응답 검증 실패, 취소)로
+            # 시험 요청이 끝나면 half-open 상태가 남아 이후 요청이 모두 거절되지 않도록 풀어 줌
+            if trial and not isinstance(e, self.failover_errors):
+                self.breaker.release_trial()
+            raise
+
+        metrics.record_llm_request(
+            self.name, response.model, response.latency, response.input_tokens, response.output_tokens
+        )
+        self.limiter.record_usage(estimated_tokens, response.input_tokens + response.output_tokens)
+        self.limiter.reward()
+        self.breaker.record_success()
+        return response
+
+    async def generate(
+        self,
+        prompt: PromptTemplate,
+        target_prompt: str,
+        output_structure,
+        img_in_data=None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResponse:
+        estimated_tokens = estimate_tokens(prompt.system_prompt) + estimate_tokens(target_prompt)
+        generate_with_retry = retry_async(
+            max_attempts=LLM_MAX_ATTEMPTS,
+            delay_seconds=1,
+            exceptions=self.retry_errors,
+            on_retry=self._on_retry,
+        )(self._generate_once)
+        try:
+            return await generate_with_retry(
+                prompt, target_prompt, output_structure, img_in_data, model or self.model, timeout, estimated_tokens
+            )
+        except self.failover_errors as e:
+            metrics.inc("llm_requests_total", provider=self.name, status=type(e).__name__)
+            if not isinstance(e, CircuitOpenError):
+                self.breaker.record_failure()
+            raise
+
+
+    async def _embed_once(self, texts: list[str], model: str, estimated_tokens: int) -> list[list[float]]:
+        trial = self.breaker.before_request()
+        try:
+            await self.limiter.acquire(estimated_tokens)
+            async with self.semaphore:
+                start_time = time.time()
+                vectors = await self._embed(texts, model)
+        except BaseException as e:
+            # embed()는 마지막 실패를 따로 기록하지 않으므로 시험 요청의 결과를 여기서 기록
+            if trial:
+                if isinstance(e, self.failover_errors):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_trial()
+            raise
+        metrics.observe("llm_embedding_seconds", time.time() - start_time, provider=self.name)
+        metrics.inc("llm_embedded_texts_total", len(texts), provider=self.name)
+        self.limiter.record_usage(estimated_tokens, estimated_tokens)
+        self.breaker.record_success()
+        return vectors
+
+    async def embed(self, texts: list[str], model: Optional[str] = None) -> list[list[float]]:
+        """
+        텍스트 리스트를 임베딩 벡터 리스트로 변환합니다. (한 번의 요청, 재시도 포함)
+        """
+        estimated_tokens = sum(estimate_tokens(text) for text in texts)
+        embed_with_retry = retry_async(
+            max_attempts=LLM_MAX_ATTEMPTS,
+            delay_seconds=1,
+            exceptions=self.retry_errors,
+            on_retry=self._on_retry,
+        )(self._embed_once)
+        return await embed_with_retry(texts, model or self.embedding_model, estimated_tokens)
+
+
+class GeminiProvider(LLMProvider):
+    retry_errors = LLMProvider.retry_errors + (genai_errors.APIError,)
+
+    def _build_client(self):
+        return genai.Client(api_key=self.api_key)
+
+    async def _close_client(self, client):
+        # 비동기 클라이언트를 닫는 aclose는 최근 google-genai에만 있음
+        aclose = getattr(client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def _generate(self, prompt, target_prompt, output_structure, img_in_data, model):
+        input_content = [prompt.render(target_prompt)]
+        if img_in_data is not None:
+            image = await async_encode_image_bytes(img_in_data, self.name)
+            input_content.append(genai.types.Part.from_bytes(data=image, mime_type="image/jpeg"))
+
+        chat_completion = await self.client.aio.models.generate_content(
+            model=model,
+            contents=input_content,
+            config={
+                "system_instruction": prompt.system_prompt,
+                "response_mime_type": "application/json",
+                "response_schema": output_structure,
+            },
+        )
+        usage = chat_completion.usage_metadata
+        return LLMResponse(
+            provider=self.name,
+            model=model,
+            parsed=chat_completion.parsed,
+            input_tokens=(usage.prompt_token_count or 0) if usage else 0,
+            output_tokens=(usage.candidates_token_count or 0) if usage else 0,
+        )
+
+    async def _embed(self, texts, model):
+        response = await self.client.aio.models.embed_content(model=model, contents=texts)
+        return [embedding.values for embedding in response.embeddings]
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    OpenAI chat completions API와 호환되는 provider(GPT, DeepSeek)입니다.
+    json_schema 응답 형식을 지원하지 않는 provider는 json_object 모드로 요청한 뒤 직접 검증합니다.
+    """
+
+    retry_errors = LLMProvider.retry_errors + (openai.APIError,)
+
+    def __init__(self, name, model, api_key_env, max_concurrency, base_url: str = None, json_schema: bool = True, **limits):
+        super().__init__(name, model, api_key_env, max_concurrency, **limits)
+        self.base_url = base_url
+        self.json_schema = json_schema
+        self._sync_client = None
+
+    def _build_client(self):
+        # 재시도는 retry_async에서 하므로 SDK 자체 재시도는 끔
+        return openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, http_client=get_http_client(), max_retries=0
+        )
+
+    async def _close_client(self, client):
+        # 공유 HTTP 커넥션 풀(get_http_client)은 aclose_providers에서 닫음
+        await client.close()
+
+    @property
+    def sync_client(self) -> openai.OpenAI:
+        if self._sync_client is None:
+            self._sync_client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._sync_client
+
+    async def _generate(self, prompt, target_prompt, output_structure, img_in_data, model):
+        system_prompt = prompt.system_prompt
+        if not self.json_schema:
+            system_prompt += f"\n\nJSON schema:\n{output_structure.model_json_schema()}"
+
+        input_content = [{"type": "text", "text": prompt.render(target_prompt)}]
+        if img_in_data is not None:
+            image = base64.b64encode(await async_encode_image_bytes(img_in_data, self.name)).decode("utf-8")
+            input_content.append(
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{image}"},
+                }
+            )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": input_content},
+        ]
+
+        if self.json_schema:
+            chat_completion = await self.client.beta.chat.completions.parse(
+                model=model, messages=messages, response_format=output_structure
+            )
+            parsed = chat_completion.choices[0].message.parsed
+        else:
+            chat_completion = await self.client.chat.completions.create(
+                model=model, messages=messages, response_format={"type": "json_object"}
+            )
+            parsed = output_structure.model_validate_json(chat_completion.choices[0].message.content)
+
+        usage = chat_completion.usage
+        return LLMResponse(
+            provider=self.name,
+            model=model,
+            parsed=parsed,
+            input_tokens=usage.prompt_tokens if usage else 0,
+            output_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    async def _embed(self, texts, model):
+        response = await self.client.embeddings.create(model=model, input=texts)
+        return [item.embedding for item in response.data]
+
+
+_providers: dict[str, LLMProvider] = {}
+# API 키가 없어 건너뛴다고 이미 경고한 provider
+_missing_credentials: set[str] = set()
+
+
+def get_provider(name: str) -> LLMProvider:
+    """
+    config의 LLM_PROVIDERS 설정으로 provider를 만들어 재사용합니다.
+    """
+    provider = _providers.get(name)
+    if provider is None:
+        config = LLM_PROVIDERS[name]
+        limits = {
+            "requests_per_minute": config.get("requests_per_minute"),
+            "tokens_per_minute": config.get("tokens_per_minute"),
+            "embedding_model": config.get("embedding_model"),
+        }
+        if name == "gemini":
+            provider = GeminiProvider(name, config["model"], config["api_key_env"], config["max_concurrency"], **limits)
+        else:
+            provider = OpenAICompatibleProvider(
+                name,
+                config["model"],
+                config["api_key_env"],
+                config["max_concurrency"],
+                base_url=config.get("base_url"),
+                # DeepSeek은 json_schema 응답 형식을 지원하지 않음
+                json_schema=name != "deepseek",
+                **limits,
+            )
+        _providers[name] = provider
+    return provider
+
+
+async def aclose_providers():
+    """
+    현재 이벤트 루프에서 만든 provider 클라이언트와 공유 HTTP 커넥션 풀을 닫습니다.
+    asyncio.run을 여러 번 호출하는 경우, 각 asyncio.run의 코루틴이 끝나기 전에 await 해야 커넥션이 남지 않습니다.
+    """
+    for provider in _providers.values():
+        await provider.aclose()
+    http_client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if http_client is not None:
+        await http_client.aclose()
+
+
+async def closing_providers(awaitable):
+    """
+    awaitable을 실행한 뒤 (실패해도) aclose_providers()를 호출합니다. asyncio.run(closing_providers(...))로 사용합니다.
+    """
+    try:
+        return await awaitable
+    finally:
+        await aclose_providers()
+
+
+async def run_llm(
+    target_prompt: str,
+    prompt_in_path: str,
+    output_structure,
+    img_in_data=None,
+    providers: Sequence[str] = ("gemini", "gpt"),
+    timeout: float = LLM_FAILOVER_TIMEOUT,
+) -> LLMResponse:
+    """
+    provider에 상관없이 같은 방식으로 구조화된 응답을 요청합니다.
+    providers 순서대로 시도하며, 앞선 provider가 timeout 안에 응답하지 못하거나
+    API 오류(rate limit 등)가 발생하면 다음 provider로 넘어갑니다.
+    API 키 환경변수가 없는 provider는 건너뛰고, 모두 실패하면 마지막 provider의 오류를 그대로 발생시킵니다.
+    """
+    prompt = load_prompt(prompt_in_path)
+
+    last_error = None
+    for name in providers:
+        provider = get_provider(name)
+        if not provider.has_credentials:
+            # 클라이언트 생성 오류가 앞선 provider의 실제 오류를 가리지 않도록 시도하지 않음
+            if name not in _missing_credentials:
+                _missing_credentials.add(name)
+                logging.warning(f"[{name.upper()}] {provider.api_key_env} is not set, skipping this provider")
+            continue
+        try:
+            response = await provider.generate(
+                prompt, target_prompt, output_structure, img_in_data=img_in_data, timeout=timeout
+            )
+            logging.info(
+                f"[{name.upper()}] Request completed. Time taken: {response.latency:.2f} / "
+                f"Tokens(in/out) : {response.input_tokens}/{response.output_tokens} / "
+                f"Pricing(KRW) : {estimate_cost(response.model, response.input_tokens, response.output_tokens) * USD_TO_KRW:.2f}"
+            )
+            return response
+        except provider.failover_errors as e:
+            logging.warning(f"[{name.upper()}] Request failed ({type(e).__name__}: {e}), trying next provider")
+            last_error = e
+
+    if last_error is None:
+        raise ValueError(f"No API key is set for any of the providers: {', '.join(providers)}")
+    raise last_error
+
+
+async def run_embedding(
+    texts: list[str], provider: str = EMBEDDING_PROVIDER, batch_size: int = EMBEDDING_BATCH_SIZE
+) -> list[list[float]]:
+    """
+    텍스트를 batch_size개씩 나누어 동시에 임베딩합니다.
+    같은 인덱스 안의 벡터는 차원이 같아야 하므로 다른 provider로 failover 하지 않습니다.
+    """
+    embedder = get_provider(provider)
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*[embedder.embed(batch) for batch in batches])
+    return [vector for vectors in results for vector in vectors]
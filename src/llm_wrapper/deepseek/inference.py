@@ -1,16 +1,7 @@
 from src.utils.decorator import retry_async
-import openai, os, json
-
-prompt_base_path = "src/llm/prompt"
-async_client = openai.AsyncOpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com/v1",
-)
-
-client = openai.OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com/v1",
-)
+from src.llm_wrapper.prompt_registry import load_prompt
+from src.llm_wrapper.client import get_provider
+import openai
 
 
 def run_deepseek(
@@ -22,22 +13,12 @@ def run_deepseek(
     deepseek chat 모델 사용 코드
     """
 
-    # Load prompt
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
     input_content = [{"type": "text", "text": user_prompt_text}]
 
-    chat_completion = client.beta.chat.completions.parse(
+    chat_completion = get_provider("deepseek").sync_client.beta.chat.completions.parse(
         model=llm_model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -56,22 +37,12 @@ async def async_run_deepseek(
     deepseek chat 모델 사용 코드
     """
 
-    # Load prompt
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
     input_content = [{"type": "text", "text": user_prompt_text}]
 
-    chat_completion = await async_client.beta.chat.completions.parse(
+    chat_completion = await get_provider("deepseek").client.beta.chat.completions.parse(
         model=llm_model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -82,7 +53,11 @@ async def async_run_deepseek(
     return chat_output, chat_completion
 
 
-@retry_async(max_attempts=3, delay_seconds=1, exceptions=(Exception,))
+@retry_async(
+    max_attempts=3,
+    delay_seconds=1,
+    exceptions=(openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError),
+)
 async def run_deepseek_stream(
     target_prompt: str,
     prompt_in_path: str,
@@ -91,22 +66,12 @@ async def run_deepseek_stream(
     """
     deepseek chat 모델 사용 코드 (비동기 + 스트리밍)
     """
-    # Load prompt
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
     input_content = [{"type": "text", "text": user_prompt_text}]
 
-    stream = await async_client.chat.completions.create(
+    stream = await get_provider("deepseek").client.chat.completions.create(
         model=llm_model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -1,68 +1,26 @@
-from PIL import Image
-from io import BytesIO
 from dotenv import load_dotenv
+from src.llm_wrapper.prompt_registry import load_prompt
+from src.llm_wrapper.client import get_provider
+from src.llm_wrapper.image import encode_image_bytes, async_encode_image_bytes
 
-import requests, openai, os, json, base64
+import base64
 
 load_dotenv()
 
-prompt_base_path = "src/llm/prompt"
-async_client = openai.AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
-client = openai.OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
 def encode_image(image_source):
     """
     이미지 경로가 URL이든 로컬 파일이든 Pillow Image 객체이든 동일하게 처리하는 함수.
-    이미지를 열어 base64로 인코딩합니다.
+    GPT에 맞는 크기로 줄인 JPEG를 base64로 인코딩합니다. (src.llm_wrapper.image 참고)
     Pillow에서 지원되지 않는 포맷에 대해서는 예외를 발생시킵니다.
     """
-    try:
-        # 이미 Pillow 이미지 객체인 경우 그대로 사용
-        if isinstance(image_source, Image.Image):
-            image = image_source
-        else:
-            # URL에서 이미지 다운로드
-            if isinstance(image_source, str) and (
-                image_source.startswith("http://")
-                or image_source.startswith("https://")
-            ):
-                response = requests.get(image_source)
-                image = Image.open(BytesIO(response.content))
-            # 로컬 파일에서 이미지 열기
-            else:
-                image = Image.open(image_source)
-
-        # 이미지 포맷이 None인 경우 (메모리에서 생성된 이미지 등)
-        if image.format is None:
-            # logger.warning("Image format is None. Defaulting to JPEG.")
-            image_format = "JPEG"
-        else:
-            image_format = image.format
-
-        # 이미지 포맷이 지원되지 않는 경우 예외 발생
-        if image_format not in Image.registered_extensions().values():
-            raise ValueError(f"Unsupported image format: {image_format}.")
-
-        buffered = BytesIO()
-        # PIL에서 지원되지 않는 포맷이나 다양한 채널을 RGB로 변환 후 저장
-        if image.mode in ("RGBA", "P", "CMYK"):  # RGBA, 팔레트, CMYK 등은 RGB로 변환
-            image = image.convert("RGB")
-        image.save(buffered, format="JPEG")
-
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-    except requests.exceptions.RequestException as e:
-        raise ValueError(f"Failed to download the image from URL: {e}")
-    except IOError as e:
-        raise ValueError(f"Failed to process the image file: {e}")
-    except ValueError as e:
-        raise ValueError(e)
-    
+    return base64.b64encode(encode_image_bytes(image_source, "gpt")).decode("utf-8")
+
+
+async def async_encode_image(image_source):
+    """
+    encode_image의 비동기 버전입니다. 다운로드와 인코딩이 이벤트 루프를 막지 않습니다.
+    """
+    return base64.b64encode(await async_encode_image_bytes(image_source, "gpt")).decode("utf-8")
 
 
 def run_gpt(
@@ -77,18 +35,9 @@ def run_gpt(
     이미지+텍스트 데이터에 대해 gpt 모델을 사용합니다.
     structured, step 등 beta 기능을 적용한 코드입니다.
     """
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
 
     input_content = [{"type": "text", "text": user_prompt_text}]
 
@@ -104,7 +53,7 @@ def run_gpt(
             }
         )
 
-    chat_completion = client.beta.chat.completions.parse(
+    chat_completion = get_provider("gpt").sync_client.beta.chat.completions.parse(
         model=gpt_model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -131,23 +80,14 @@ async def async_run_gpt(
     이미지+텍스트 데이터에 대해 gpt 모델을 사용합니다.
     structured, step 등 beta 기능을 적용한 코드입니다.
     """
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
 
     input_content = [{"type": "text", "text": user_prompt_text}]
 
     if img_in_data is not None:
-        encoded_image = encode_image(img_in_data)
+        encoded_image = await async_encode_image(img_in_data)
         input_content.append(
             {
                 "type": "image_url",
@@ -158,7 +98,7 @@ async def async_run_gpt(
             }
         )
 
-    chat_completion = await async_client.beta.chat.completions.parse(
+    chat_completion = await get_provider("gpt").client.beta.chat.completions.parse(
         model=gpt_model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -182,22 +122,13 @@ async def run_gpt_stream(
     이미지+텍스트 데이터에 대해 gpt 모델을 사용합니다.
     structured, step 등 beta 기능을 적용한 코드입니다.
     """
-    with open(
-        os.path.join(prompt_base_path, prompt_in_path), "r", encoding="utf-8"
-    ) as file:
-        prompt_dict = json.load(file)
-
-    system_prompt = prompt_dict["system_prompt"]
-    user_prompt_head, user_prompt_tail = (
-        prompt_dict["user_prompt"]["head"],
-        prompt_dict["user_prompt"]["tail"],
-    )
-
-    user_prompt_text = "\n".join([user_prompt_head, target_prompt, user_prompt_tail])
+    prompt = load_prompt(prompt_in_path)
+    system_prompt = prompt.system_prompt
+    user_prompt_text = prompt.render(target_prompt)
     input_content = [{"type": "text", "text": user_prompt_text}]
 
     if img_in_data is not None:
-        encoded_image = encode_image(img_in_data)
+        encoded_image = await async_encode_image(img_in_data)
         input_content.append(
             {
                 "type": "image_url",
@@ -208,7 +139,7 @@ async def run_gpt_stream(
             }
         )
 
-    stream = await async_client.chat.completions.create(
+    stream = await get_provider("gpt").client.chat.completions.create(
         model=gpt_model,
         messages=[
             {"role": "system", "content": system_prompt},
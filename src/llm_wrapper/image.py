@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+from common.config.config import IMAGE_MAX_RESOLUTION, IMAGE_JPEG_QUALITY, IMAGE_ENCODE_WORKERS, IMAGE_CACHE_SIZE
+from src.utils.metrics import metrics
+
+import asyncio, hashlib, threading
+import httpx
+
+DEFAULT_MAX_RESOLUTION = (2048, 2048)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_ENCODE_WORKERS, thread_name_prefix="image")
+        return _executor
+
+
+class EncodedImageCache:
+    """
+    원본 이미지 내용의 해시와 목표 해상도를 키로, 인코딩된 JPEG bytes를 최근 사용 순으로 max_size개까지 보관합니다.
+    같은 포스터가 여러 공지(재공지, 리마인더)에 붙어 와도 디코딩·리사이즈는 한 번만 합니다.
+    """
+
+    def __init__(self, max_size: int = IMAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+image_cache = EncodedImageCache()
+
+
+def _is_url(source) -> bool:
+    return isinstance(source, str) and source.startswith(("http://", "https://"))
+
+
+def _target_size(size: tuple[int, int], max_resolution: tuple[int, int]) -> tuple[int, int]:
+    """
+    긴 변과 짧은 변이 각각 max_resolution을 넘지 않도록 비율을 유지한 크기를 반환합니다. (키우지 않음)
+    """
+    max_long, max_short = max_resolution
+    scale = min(1.0, max_long / max(size), max_short / min(size))
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _encode(data, max_resolution: tuple[int, int]) -> bytes:
+    """
+    이미지(bytes 또는 Pillow Image)를 RGB JPEG bytes로 변환합니다.
+    """
+    try:
+        image = data if isinstance(data, Image.Image) else Image.open(BytesIO(data))
+        if image.format is not None and image.format not in Image.registered_extensions().values():
+            raise ValueError(f"Unsupported image format: {image.format}.")
+        if image is not data and image.format == "JPEG":
+            # JPEG는 디코딩 단계에서 1/2, 1/4, 1/8로 줄여 읽어 큰 포스터의 디코딩 비용을 줄임
+            image.draft("RGB", _target_size(image.size, max_resolution))
+        image = ImageOps.exif_transpose(image)
+        size = _target_size(image.size, max_resolution)
+        if image.size != size:
+            image = image.resize(size, Image.LANCZOS)
+        if image.mode != "RGB":  # RGBA, 팔레트, CMYK 등은 RGB로 변환
+            image = image.convert("RGB")
+        buffered = BytesIO()
+        image.save(buffered, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        return buffered.getvalue()
+    except OSError as e:
+        raise ValueError(f"Failed to process the image file: {e}")
+
+
+def _encode_cached(source, max_resolution: tuple[int, int]) -> bytes:
+    """
+    로컬 파일 경로, bytes, Pillow Image를 인코딩합니다. 파일·bytes는 내용의 sha256으로 캐시합니다.
+    """
+    if isinstance(source, Image.Image):
+        metrics.inc("image_encodes_total", status="encoded")
+        return _encode(source, max_resolution)
+    if not isinstance(source, bytes):
+        try:
+            with open(source, "rb") as file:
+                source = file.read()
+        except OSError as e:
+            raise ValueError(f"Failed to process the image file: {e}")
+
+    key = (hashlib.sha256(source).hexdigest(), max_resolution)
+    encoded = image_cache.get(key)
+    if encoded is not None:
+        metrics.inc("image_encodes_total", status="cached")
+        return encoded
+    encoded = _encode(source, max_resolution)
+    image_cache.put(key, encoded)
+    metrics.inc("image_encodes_total", status="encoded")
+    return encoded
+
+
+def encode_image_bytes(source, provider: str = "gpt") -> bytes:
+    """
+    URL, 로컬 파일 경로, bytes, Pillow Image를 provider에 맞는 크기의 JPEG bytes로 변환합니다. (동기 버전)
+    """
+    if _is_url(source):
+        try:
+            response = httpx.get(source, timeout=30, follow_redirects=True)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ValueError(f"Failed to download the image from URL: {e}")
+        source = response.content
+    return _encode_cached(source, IMAGE_MAX_RESOLUTION.get(provider, DEFAULT_MAX_RESOLUTION))
+
+
+async def async_encode_image_bytes(source, provider: str = "gpt") -> bytes:
+    """
+    encode_image_bytes의 비동기 버전입니다.
+    URL은 공유 커넥션 풀로 받고, 파일 읽기·해시·디코딩·리사이즈·인코딩은 스레드 풀에서 실행하여 이벤트 루프를 막지 않습니다.
+    """
+    # client.py가 이 모듈을 사용하므로 순환 import를 피하기 위해 함수 안에서 import
+    from src.llm_wrapper.client import get_http_client
+
+    if _is_url(source):
+        try:
+            response = await get_http_client().get(source, timeout=30, follow_redirects=True)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ValueError(f"Failed to download the image from URL: {e}")
+        source = response.content
+    max_resolution = IMAGE_MAX_RESOLUTION.get(provider, DEFAULT_MAX_RESOLUTION)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), _encode_cached, source, max_resolution)
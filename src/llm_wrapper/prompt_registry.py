@@ -0,0 +1,77 @@
+import os, json, time, hashlib, threading
+
+PROMPT_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt")
+
+# 프롬프트 파일 변경 여부(mtime)를 다시 확인하기까지의 최소 간격(초)
+PROMPT_CHECK_INTERVAL = 1.0
+
+
+class PromptTemplate:
+    """
+    한 번 로드/검증된 프롬프트 파일입니다.
+    user prompt의 head/tail을 미리 합쳐 두어 render()는 문자열 연결만 수행합니다.
+    """
+
+    __slots__ = ("system_prompt", "head", "tail", "digest", "_prefix", "_suffix")
+
+    def __init__(self, system_prompt: str, head: str, tail: str, digest: str):
+        self.system_prompt = system_prompt
+        self.head = head
+        self.tail = tail
+        # 프롬프트 파일 내용의 sha256 (캐시 키 등에 사용)
+        self.digest = digest
+        self._prefix = head + "\n"
+        self._suffix = "\n" + tail
+
+    def render(self, target_prompt: str) -> str:
+        """
+        head / target_prompt / tail을 줄바꿈으로 이어 user prompt를 만듭니다.
+        """
+        return self._prefix + target_prompt + self._suffix
+
+
+def _parse_prompt(raw: bytes, path: str) -> PromptTemplate:
+    """
+    프롬프트 파일 내용을 검증하여 PromptTemplate으로 변환합니다.
+    """
+    try:
+        prompt_dict = json.loads(raw)
+        system_prompt = prompt_dict["system_prompt"]
+        head, tail = prompt_dict["user_prompt"]["head"], prompt_dict["user_prompt"]["tail"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid prompt file {path}: {e}")
+
+    if not all(isinstance(value, str) for value in (system_prompt, head, tail)):
+        raise ValueError(f"Invalid prompt file {path}: system_prompt, head and tail must be strings")
+
+    return PromptTemplate(system_prompt, head, tail, hashlib.sha256(raw).hexdigest())
+
+
+# path -> (mtime_ns, 마지막 확인 시각, PromptTemplate)
+_templates: dict[str, tuple[int, float, PromptTemplate]] = {}
+_lock = threading.Lock()
+
+
+def load_prompt(prompt_in_path: str, base_path: str = PROMPT_BASE_PATH) -> PromptTemplate:
+    """
+    프롬프트 파일을 한 번만 로드하여 재사용합니다.
+    PROMPT_CHECK_INTERVAL마다 mtime을 확인하여, 파일이 바뀌었으면 다시 로드합니다.
+    """
+    path = os.path.join(base_path, prompt_in_path)
+    now = time.monotonic()
+
+    cached = _templates.get(path)
+    if cached is not None and now - cached[1] < PROMPT_CHECK_INTERVAL:
+        return cached[2]
+
+    with _lock:
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = _templates.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            _templates[path] = (mtime_ns, now, cached[2])
+            return cached[2]
+
+        with open(path, "rb") as file:
+            template = _parse_prompt(file.read(), path)
+        _templates[path] = (mtime_ns, now, template)
+        return template
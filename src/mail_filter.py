@@ -0,0 +1,156 @@
+from datetime import datetime
+from pydantic import BaseModel
+from common.config.config import MAIL_FILTER, MAIL_FILTER_PATH
+
+import os, json, calendar, fnmatch
+
+
+def to_epoch(value: datetime) -> int:
+    """
+    datetime을 Envelope Index의 date_received와 같은 epoch 초로 바꿉니다.
+    시간대가 없는 datetime은 strftime('%s', ?)와 마찬가지로 UTC로 해석합니다.
+    """
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple())
+    return int(value.timestamp())
+
+
+def glob_to_like(pattern: str) -> str:
+    """
+    "*재공지*" 같은 glob 패턴을 LIKE 패턴으로 바꿉니다. (ESCAPE '\\' 와 함께 사용)
+    """
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+class MailFilter(BaseModel):
+    """
+    가져올 메일 조건입니다. 필드 안의 값들은 OR, 필드끼리는 AND로 묶입니다.
+    - senders / exclude_senders : 발신 주소 (glob 패턴 가능, 예: "*@postech.ac.kr")
+    - mailboxes : 메일함 URL에 포함되는 문자열 (예: "교내회보")
+    - subject_patterns / exclude_subject_patterns : 제목 glob 패턴 (예: "*세미나*")
+    - since / until : 수신 시각 구간
+    - read / flagged : 읽음·깃발 여부 (None이면 거르지 않음)
+    compile()은 Envelope Index용 WHERE 절과 파라미터를 만들어 모든 조건을 SQLite 안에서 거릅니다.
+    """
+
+    senders: list[str]=[]
+    exclude_senders: list[str]=[]
+    mailboxes: list[str]=[]
+    subject_patterns: list[str]=[]
+    exclude_subject_patterns: list[str]=[]
+    since: datetime=None
+    until: datetime=None
+    read: bool=None
+    flagged: bool=None
+
+    @staticmethod
+    def _address_clause(patterns: list[str], params: list) -> str:
+        exact = [p for p in patterns if "*" not in p and "?" not in p]
+        globs = [p for p in patterns if p not in exact]
+        conditions = []
+        if exact:
+            # matches()와 같이 대소문자를 구분하지 않음 (LIKE도 ASCII는 대소문자를 구분하지 않음)
+            conditions.append(f"address COLLATE NOCASE IN ({', '.join('?' * len(exact))})")
+            params.extend(exact)
+        for pattern in globs:
+            conditions.append("address LIKE ? ESCAPE '\\'")
+            params.append(glob_to_like(pattern))
+        return f"m.sender IN (SELECT ROWID FROM addresses WHERE {' OR '.join(conditions)})"
+
+    @staticmethod
+    def _subject_clause(patterns: list[str], params: list) -> str:
+        params.extend(glob_to_like(pattern) for pattern in patterns)
+        conditions = " OR ".join("subject LIKE ? ESCAPE '\\'" for _ in patterns)
+        return f"m.subject IN (SELECT ROWID FROM subjects WHERE {conditions})"
+
+    def compile(self) -> tuple[str, list]:
+        """
+        WHERE 절 조각과 파라미터를 반환합니다. 조건이 없으면 "1"입니다.
+        발신자·메일함·제목은 각 테이블에서 ROWID를 먼저 찾으므로 messages의 인덱스로 조회됩니다.
+        """
+        clauses, params = [], []
+        if self.senders:
+            clauses.append(self._address_clause(self.senders, params))
+        if self.exclude_senders:
+            clauses.append("NOT " + self._address_clause(self.exclude_senders, params))
+        if self.mailboxes:
+            clauses.append(
+                "m.mailbox IN (SELECT ROWID FROM mailboxes WHERE "
+                + " OR ".join("url LIKE ? ESCAPE '\\'" for _ in self.mailboxes)
+                + ")"
+            )
+            params.extend(f"%{glob_to_like(mailbox)}%" for mailbox in self.mailboxes)
+        if self.subject_patterns:
+            clauses.append(self._subject_clause(self.subject_patterns, params))
+        if self.exclude_subject_patterns:
+            clauses.append("NOT " + self._subject_clause(self.exclude_subject_patterns, params))
+        if self.since is not None:
+            clauses.append("m.date_received >= ?")
+            params.append(to_epoch(self.since))
+        if self.until is not None:
+            clauses.append("m.date_received <= ?")
+            params.append(to_epoch(self.until))
+        if self.read is not None:
+            clauses.append("m.read = ?")
+            params.append(int(self.read))
+        if self.flagged is not None:
+            clauses.append("m.flagged = ?")
+            params.append(int(self.flagged))
+
+        return " AND ".join(clauses) or "1", params
+
+    def matches(
+        self,
+        sender: str,
+        subject: str,
+        received: datetime = None,
+        mailbox: str = None,
+        read: bool = None,
+        flagged: bool = None,
+    ) -> bool:
+        """
+        SQL로 거를 수 없는 소스(Graph delta 등)에서 compile()과 같은 조건을 Python으로 확인합니다.
+        값이 None인 항목(mailbox 등)은 확인하지 않습니다.
+        """
+        def any_match(value, patterns):
+            return any(fnmatch.fnmatchcase((value or "").lower(), pattern.lower()) for pattern in patterns)
+
+        if self.senders and not any_match(sender, self.senders):
+            return False
+        if self.exclude_senders and any_match(sender, self.exclude_senders):
+            return False
+        if self.mailboxes and mailbox is not None and not any_match(mailbox, [f"*{m}*" for m in self.mailboxes]):
+            return False
+        if self.subject_patterns and not any_match(subject, self.subject_patterns):
+            return False
+        if self.exclude_subject_patterns and any_match(subject, self.exclude_subject_patterns):
+            return False
+        if received is not None:
+            if self.since is not None and to_epoch(received) < to_epoch(self.since):
+                return False
+            if self.until is not None and to_epoch(received) > to_epoch(self.until):
+                return False
+        if self.read is not None and read is not None and read != self.read:
+            return False
+        if self.flagged is not None and flagged is not None and flagged != self.flagged:
+            return False
+        return True
+
+    def between(self, start: datetime = None, end: datetime = None) -> "MailFilter":
+        """
+        수신 시각 구간을 [start, end]와의 교집합으로 좁힌 필터를 반환합니다.
+        """
+        since = max((d for d in (self.since, start) if d is not None), default=None, key=to_epoch)
+        until = min((d for d in (self.until, end) if d is not None), default=None, key=to_epoch)
+        return self.model_copy(update={"since": since, "until": until})
+
+
+def load_mail_filter(path: str = MAIL_FILTER_PATH) -> MailFilter:
+    """
+    path의 JSON 파일로 필터를 만듭니다. 파일이 없으면 config의 MAIL_FILTER를 사용합니다.
+    """
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return MailFilter.model_validate(json.load(file))
+    return MailFilter.model_validate(MAIL_FILTER)
@@ -0,0 +1,117 @@
+from collections import deque
+from contextlib import aclosing
+from typing import Callable, Optional
+from src.cache import ExtractionCache
+from src.dedup import MailDeduplicator
+from src.extract import iter_extract_events
+from src.fetch import save_fetch_state
+from src.preprocess import BoilerplateFilter, preprocess_mail
+from src.utils.utils import parse_mail, aiter_items
+from src.utils.metrics import metrics
+
+import inspect, logging
+
+
+class Watermark:
+    """
+    완료 순서가 뒤섞여도, 앞선 메일이 모두 처리된 지점까지만 high-water mark를 올립니다.
+    ROWID 오름차순으로 들어오는 메일(iter_new_mails_from_apple_mail)에 사용합니다.
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.pulled = deque()
+        self.done = set()
+        self.date_received = {}
+
+    def track(self, mail):
+        self.pulled.append(mail.rowid)
+        self.date_received[mail.rowid] = mail.date_received
+
+    def complete(self, mail):
+        self.done.add(mail.rowid)
+        last_rowid, last_date_received = None, None
+        while self.pulled and self.pulled[0] in self.done:
+            last_rowid = self.pulled.popleft()
+            last_date_received = self.date_received.pop(last_rowid)
+            self.done.discard(last_rowid)
+        if last_rowid is not None:
+            save_fetch_state(last_rowid, last_date_received, self.state_path)
+
+
+async def _parse_rows(
+    rows,
+    watermark: Optional[Watermark] = None,
+    preprocess: bool = True,
+    boilerplate: Optional[BoilerplateFilter] = None,
+):
+    """
+    fetch 단계의 행을 하나씩 Mail로 변환하고, preprocess가 True이면 본문을 LLM 입력용으로 정리합니다.
+    """
+    rows = aiter_items(rows)
+    while True:
+        with metrics.stage("fetch"):
+            try:
+                row = await rows.__anext__()
+            except StopAsyncIteration:
+                break
+        with metrics.stage("parse"):
+            mail = parse_mail(row)
+        metrics.inc("pipeline_mails_total", stage="parse")
+        if preprocess:
+            with metrics.stage("preprocess"):
+                preprocess_mail(mail, boilerplate=boilerplate)
+            metrics.inc("preprocess_chars_total", len(mail.summary or ""), kind="raw")
+            metrics.inc("preprocess_chars_total", len(mail.body), kind="compact")
+        if watermark is not None:
+            watermark.track(mail)
+        yield mail
+
+
+async def run_pipeline(
+    rows,
+    sink: Optional[Callable] = None,
+    concurrency: int = 10,
+    cache: Optional[ExtractionCache] = None,
+    state_path: Optional[str] = None,
+    pack_token_budget: Optional[int] = None,
+    preprocess: bool = True,
+    boilerplate: Optional[BoilerplateFilter] = None,
+    dedup: Optional[MailDeduplicator] = None,
+) -> int:
+    """
+    fetch → parse → extract → sink 단계를 스트리밍으로 연결합니다.
+    - rows: fetch 단계의 (async) iterable. 필요할 때마다 한 행씩 읽습니다.
+    - sink: 추출이 끝난 메일을 받는 함수(동기/비동기 모두 가능). 완료되는 순서대로 호출됩니다.
+    - 동시에 진행되는 요청은 concurrency개로 제한되며, sink가 느리면 상류에서 새 메일을 읽지 않습니다.
+    - pack_token_budget이 주어지면 짧은 메일 여러 개를 한 요청으로 묶습니다.
+    - preprocess가 True이면 본문에서 HTML·상용구를 걷어내고 MAIL_TOKEN_BUDGET에 맞춰 자릅니다.
+      boilerplate(BoilerplateFilter)를 주면 같은 발신자 메일에 반복되는 꼬리말도 학습하여 제거합니다.
+    - dedup(MailDeduplicator)이 주어지면 거의 같은 메일은 대표 메일만 추출하고 결과를 나머지에 복사합니다.
+    - state_path가 주어지면 sink까지 끝난 메일 기준으로 high-water mark를 저장하여
+      중간에 실패해도 다음 실행에서 이어서 처리할 수 있습니다.
+
+    Returns:
+        처리한 메일 개수
+    """
+    watermark = Watermark(state_path) if state_path else None
+
+    mails = _parse_rows(rows, watermark, preprocess=preprocess, boilerplate=boilerplate)
+
+    processed_count = 0
+    # sink에서 예외가 나도 추출 단계의 진행 중인 요청이 바로 정리되도록 aclosing으로 닫음
+    async with aclosing(iter_extract_events(
+        mails, concurrency=concurrency, cache=cache, pack_token_budget=pack_token_budget, dedup=dedup
+    )) as extracted:
+        async for mail in extracted:
+            if sink is not None:
+                with metrics.stage("sink"):
+                    result = sink(mail)
+                    if inspect.isawaitable(result):
+                        await result
+            if watermark is not None:
+                watermark.complete(mail)
+            processed_count += 1
+
+    logging.info(f"[PIPELINE] Processed {processed_count} mails")
+    return processed_count
@@ -0,0 +1,323 @@
+from html import unescape
+from html.parser import HTMLParser
+from typing import Iterable, Optional
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+from common.config.config import (
+    MAIL_TOKEN_BUDGET,
+    MAIL_TRUNCATION_POLICY,
+    MAIL_BOILERPLATE_PATTERNS,
+    MAIL_BOILERPLATE_SENTENCE_PATTERNS,
+    BOILERPLATE_STATE_PATH,
+)
+from common.types.types import Mail
+from src.dedup import normalize_subject
+from src.utils.ratelimit import estimate_tokens
+
+import os, re, json, hashlib
+
+# 내용이 없거나 LLM에 불필요한 태그 (안쪽 텍스트까지 버림)
+SKIP_TAGS = {"script", "style", "head", "title", "noscript", "template", "svg", "object", "iframe"}
+# 줄바꿈을 만드는 블록 태그
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "section", "article", "header", "footer", "blockquote", "pre", "hr", "table", "tbody", "thead",
+}
+# 추적용 URL 파라미터
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|_hsenc|_hsmi)$", re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<\s*(html|body|div|p|br|table|span|a)\b", re.IGNORECASE)
+BOILERPLATE_PATTERN = re.compile("|".join(f"(?:{p})" for p in MAIL_BOILERPLATE_PATTERNS), re.IGNORECASE)
+# 앞의 패턴이 먼저 지워지도록 순서대로 적용 ("본 메일은 발신 전용으로 회신하실 수 없습니다" 등)
+BOILERPLATE_SENTENCE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in MAIL_BOILERPLATE_SENTENCE_PATTERNS]
+
+TRUNCATION_MARKER = "\n...(중략)...\n"
+# 이보다 짧은 줄("일시", "장소" 등)은 반복되어도 상용구로 보지 않음
+BOILERPLATE_MIN_LENGTH = 20
+# 발신자별로 기억하는 메일 수와 줄 수 (넘으면 오래된 메일 / 적게 나온 줄부터 버림)
+BOILERPLATE_MAX_MAILS = 2000
+BOILERPLATE_MAX_LINES = 20000
+
+
+def strip_tracking(url: str) -> str:
+    """
+    URL에서 utm_* 등 추적용 파라미터를 제거합니다.
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return url
+    if not parsed.query:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)]
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+class _CompactTextParser(HTMLParser):
+    """
+    HTML을 줄 단위 텍스트로 변환합니다.
+    - script/style 등은 버리고, 1x1 추적 이미지 등 img 태그는 무시합니다.
+    - 표는 한 행을 "셀 | 셀" 한 줄로 접습니다.
+    - 링크는 텍스트와 주소가 다를 때만 "텍스트 (URL)"로 남깁니다.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self.current = []
+        self.row = None
+        self.cell = None
+        self.skip_depth = 0
+        self.href = None
+        self.link_text = []
+
+    def _write(self, text: str):
+        if self.href is not None:
+            self.link_text.append(text)
+        elif self.cell is not None:
+            self.cell.append(text)
+        else:
+            self.current.append(text)
+
+    def _newline(self):
+        line = " ".join("".join(self.current).split())
+        if line:
+            self.lines.append(line)
+        self.current = []
+
+    def _end_cell(self):
+        if self.cell is None:
+            return
+        text = " ".join("".join(self.cell).split())
+        if text and self.row is not None:
+            self.row.append(text)
+        elif text:
+            self.current.append(text + " ")
+        self.cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self.row:
+            self.lines.append(" | ".join(self.row))
+        self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+            return
+        if self.skip_depth:
+            return
+        # </td>, </tr>은 생략할 수 있으므로 다음 셀/행이 시작되면 열린 셀/행을 닫음
+        if tag == "tr":
+            self._end_row()
+            self._newline()
+            self.row = []
+        elif tag in ("td", "th"):
+            self._end_cell()
+            self.cell = []
+        elif tag == "a":
+            self.href = dict(attrs).get("href") or ""
+            self.link_text = []
+        elif tag in BLOCK_TAGS:
+            if self.cell is not None:
+                self.cell.append(" ")
+            else:
+                self._newline()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ("br", "hr"):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+            return
+        if self.skip_depth:
+            return
+        if tag in ("td", "th"):
+            self._end_cell()
+        elif tag == "tr":
+            self._end_row()
+        elif tag == "table":
+            self._end_row()
+            self._newline()
+        elif tag == "a" and self.href is not None:
+            href, text = self.href, " ".join("".join(self.link_text).split())
+            self.href = None
+            if href.startswith(("http://", "https://")):
+                href = strip_tracking(href)
+                self._write(text if text == href else f"{text} ({href})" if text else href)
+            else:
+                self._write(text)
+        elif tag in BLOCK_TAGS and self.cell is None:
+            self._newline()
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self._write(data)
+
+    def close(self):
+        super().close()
+        self._end_row()
+        self._newline()
+        return self.lines
+
+
+def html_to_lines(html: str) -> list[str]:
+    """
+    HTML을 공백이 정리된 텍스트 줄 리스트로 변환합니다.
+    """
+    parser = _CompactTextParser()
+    parser.feed(html)
+    return parser.close()
+
+
+def text_to_lines(text: str) -> list[str]:
+    return [line for line in (" ".join(raw.split()) for raw in unescape(text).splitlines()) if line]
+
+
+def _line_hash(line: str) -> str:
+    return hashlib.blake2b(line.encode(), digest_size=8).hexdigest()
+
+
+class BoilerplateFilter:
+    """
+    같은 발신자의 메일에 반복해서 나오는 줄(머리말, 꼬리말, 안내 문구)을 학습하여 제거합니다.
+    - 서로 다른 min_count개 이상의 메일에 똑같이 나온 줄을 상용구로 봅니다. 같은 메일(말머리를 뗀 제목이 같은
+      재공지·리마인더 등)은 한 번만 셉니다. 짧은 줄("일시", "장소" 등)은 세지 않습니다.
+    - 제거는 path에서 불러온 (지난 실행까지의) 학습 결과로만 합니다. 이번 실행에서 본 메일은 save() 후
+      다음 실행부터 반영되므로, 같은 메일은 실행 순서나 함께 처리한 메일과 관계없이 같은 본문이 됩니다.
+    - 본문의 절반 이상을 차지하는 줄은 제거하지 않고, 모든 줄이 제거되면 원래 본문을 그대로 둡니다.
+    """
+
+    def __init__(self, min_count: int = 3, min_length: int = BOILERPLATE_MIN_LENGTH, path: Optional[str] = BOILERPLATE_STATE_PATH):
+        self.min_count = min_count
+        self.min_length = min_length
+        self.path = path
+        # {sender: {"mails": {mail_key: None}, "lines": {line_hash: count}}}
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.state = json.load(file)
+        self._learned = {
+            sender: {h for h, count in entry["lines"].items() if count >= min_count}
+            for sender, entry in self.state.items()
+        }
+
+    def learn(self, sender: str, lines: list[str], mail_key: Optional[str] = None):
+        entry = self.state.setdefault(sender, {"mails": {}, "lines": {}})
+        mail_key = mail_key or _line_hash("\n".join(lines))
+        if mail_key in entry["mails"]:
+            return
+        entry["mails"][mail_key] = None
+        if len(entry["mails"]) > BOILERPLATE_MAX_MAILS:
+            del entry["mails"][next(iter(entry["mails"]))]
+        counts = entry["lines"]
+        for line in set(lines):
+            if len(line) >= self.min_length:
+                h = _line_hash(line)
+                counts[h] = counts.get(h, 0) + 1
+        if len(counts) > BOILERPLATE_MAX_LINES:
+            entry["lines"] = dict(sorted(counts.items(), key=lambda item: -item[1])[:BOILERPLATE_MAX_LINES // 2])
+
+    def filter(self, sender: str, lines: list[str], mail_key: Optional[str] = None) -> list[str]:
+        self.learn(sender, lines, mail_key)
+        learned = self._learned.get(sender)
+        if not learned:
+            return lines
+        total = sum(len(line) for line in lines)
+        result = [line for line in lines if len(line) * 2 > total or _line_hash(line) not in learned]
+        return result or lines
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.state, file)
+        os.replace(tmp_path, self.path)
+
+
+def strip_boilerplate(lines: Iterable[str]) -> list[str]:
+    """
+    config의 MAIL_BOILERPLATE_PATTERNS에 줄 전체가 걸리는 줄과, 한 메일 안에서 반복된 긴 줄을 제거합니다.
+    MAIL_BOILERPLATE_SENTENCE_PATTERNS에 걸리는 안내 문장은 그 문장만 지우고, 남은 내용이 없으면 줄을 제거합니다.
+    """
+    seen, result = set(), []
+    for line in lines:
+        if line in seen or BOILERPLATE_PATTERN.fullmatch(line):
+            continue
+        for pattern in BOILERPLATE_SENTENCE_PATTERNS:
+            line = pattern.sub("", line)
+        line = " ".join(line.split())
+        if not line:
+            continue
+        if len(line) >= BOILERPLATE_MIN_LENGTH:
+            seen.add(line)
+        result.append(line)
+    return result
+
+
+def truncate_to_budget(text: str, token_budget: int, policy: str = MAIL_TRUNCATION_POLICY) -> str:
+    """
+    예상 토큰 수가 token_budget을 넘으면 잘라냅니다.
+    - "head" : 앞부분만 남김
+    - "head_tail" : 앞 2/3, 뒤 1/3을 남기고 가운데를 생략 (마감일·문의처가 끝에 있는 공지가 많음)
+    """
+    if token_budget is None or estimate_tokens(text) <= token_budget:
+        return text
+    # estimate_tokens는 2글자당 1토큰
+    max_chars = max(0, (token_budget - 1) * 2 - len(TRUNCATION_MARKER))
+    if policy == "head":
+        return text[:max_chars].rstrip() + TRUNCATION_MARKER.rstrip()
+    if policy == "head_tail":
+        head_chars = max_chars * 2 // 3
+        tail_chars = max_chars - head_chars
+        return text[:head_chars].rstrip() + TRUNCATION_MARKER + text[len(text) - tail_chars:].lstrip()
+    raise ValueError(f"Unknown truncation policy: {policy}")
+
+
+def compact_text(
+    content: str,
+    token_budget: Optional[int] = MAIL_TOKEN_BUDGET,
+    policy: str = MAIL_TRUNCATION_POLICY,
+    sender: Optional[str] = None,
+    boilerplate: Optional[BoilerplateFilter] = None,
+    mail_key: Optional[str] = None,
+) -> str:
+    """
+    메일 본문(HTML 또는 일반 텍스트)을 LLM 입력용의 짧은 텍스트로 정리합니다.
+    HTML → 텍스트 변환, 상용구 제거, 토큰 예산에 맞춘 자르기 순으로 처리합니다.
+    """
+    if not content:
+        return ""
+    lines = html_to_lines(content) if TAG_PATTERN.search(content) else text_to_lines(content)
+    lines = strip_boilerplate(lines)
+    if boilerplate is not None:
+        lines = boilerplate.filter(sender or "", lines, mail_key)
+    return truncate_to_budget("\n".join(lines), token_budget, policy)
+
+
+def preprocess_mail(
+    mail: Mail,
+    html: Optional[str] = None,
+    token_budget: Optional[int] = MAIL_TOKEN_BUDGET,
+    policy: str = MAIL_TRUNCATION_POLICY,
+    boilerplate: Optional[BoilerplateFilter] = None,
+) -> Mail:
+    """
+    메일의 HTML 본문(없으면 summary)을 정리하여 mail.body에 저장합니다.
+    body가 있으면 build_mail_prompt는 summary 대신 body를 LLM에 전달합니다.
+    """
+    mail.body = compact_text(
+        html if html else mail.summary,
+        token_budget=token_budget,
+        policy=policy,
+        sender=mail.sender,
+        boilerplate=boilerplate,
+        mail_key=normalize_subject(mail.subject) if mail.subject else None,
+    )
+    # 상용구를 지우고 남은 내용이 없으면 원래 summary를 그대로 사용 (빈 메일을 LLM에 보내지 않음)
+    if not mail.body and mail.summary:
+        mail.body = truncate_to_budget("\n".join(text_to_lines(mail.summary)), token_budget, policy)
+    return mail
@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from common.config.config import EMBEDDING_INDEX_DIRECTORY
+from common.types.types import StoredEvent
+from src.llm_wrapper.client import run_embedding
+from src.store import EventStore
+
+import os, json, math, logging
+import numpy as np
+
+# 메일을 받은 지 RECENCY_HALF_LIFE_DAYS일이 지나면 최신성 가산점이 절반이 됨
+RECENCY_WEIGHT = 0.1
+RECENCY_HALF_LIFE_DAYS = 7.0
+# 이벤트 시작까지 DEADLINE_HALF_LIFE_DAYS일 남으면 임박 가산점이 절반이 됨
+DEADLINE_WEIGHT = 0.15
+DEADLINE_HALF_LIFE_DAYS = 3.0
+
+SECONDS_PER_DAY = 86400.0
+
+
+def event_text(event: StoredEvent) -> str:
+    """
+    이벤트 임베딩에 사용할 텍스트입니다.
+    """
+    return "\n".join(part for part in (event.title, event.location or event.url, event.explanation) if part)
+
+
+def _to_timestamp(value: Optional[str]) -> float:
+    """
+    "YYYY-MM-DD HH:MM:SS"(UTC) 또는 ISO 형식 문자열을 epoch 초로 바꿉니다. 읽을 수 없으면 NaN입니다.
+    """
+    if not value:
+        return math.nan
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return math.nan
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    이벤트 임베딩을 NumPy 배열로 보관하는 인덱스입니다.
+    - vectors: (n, dim) float32, L2 정규화되어 있어 내적이 곧 cosine 유사도입니다.
+    - times: (n, 3) float64, 각 행은 (start_ts, end_ts, received_ts) 입니다.
+    - save()한 디렉토리를 load(mmap=True)로 열면 벡터를 메모리에 올리지 않고 바로 조회합니다.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self.times = np.empty((0, 3), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, event_id: str):
+        return event_id in self.positions
+
+    def add(self, ids: list[str], vectors, times) -> int:
+        """
+        아직 없는 id만 추가합니다. 추가한 개수를 반환합니다.
+        """
+        vectors, times = _normalize(vectors), np.asarray(times, dtype=np.float64)
+        keep = [i for i, event_id in enumerate(ids) if event_id not in self.positions]
+        if not keep:
+            return 0
+        if len(self.ids) == 0:
+            self.vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        elif vectors.shape[1] != self.vectors.shape[1]:
+            raise ValueError(f"Embedding dimension mismatch: {vectors.shape[1]} != {self.vectors.shape[1]}")
+
+        for i in keep:
+            self.positions[ids[i]] = len(self.ids)
+            self.ids.append(ids[i])
+        self.vectors = np.concatenate([self.vectors, vectors[keep]])
+        self.times = np.concatenate([self.times, times[keep]])
+        return len(keep)
+
+    def prune(self, before_ts: float) -> int:
+        """
+        before_ts 이전에 끝난 이벤트를 제거합니다. 제거한 개수를 반환합니다.
+        """
+        return self._keep(self.times[:, 1] >= before_ts)
+
+    def retain(self, event_ids) -> int:
+        """
+        event_ids에 없는 이벤트(재추출로 바뀐 이벤트 등)를 제거합니다. 제거한 개수를 반환합니다.
+        """
+        event_ids = set(event_ids)
+        return self._keep(np.array([event_id in event_ids for event_id in self.ids], dtype=bool))
+
+    def _keep(self, keep: np.ndarray) -> int:
+        removed = int(len(keep) - keep.sum())
+        if removed:
+            self.ids = [event_id for event_id, kept in zip(self.ids, keep) if kept]
+            self.positions = {event_id: i for i, event_id in enumerate(self.ids)}
+            self.vectors = np.ascontiguousarray(self.vectors[keep])
+            self.times = np.ascontiguousarray(self.times[keep])
+        return removed
+
+    def boosts(
+        self,
+        now: float,
+        recency_weight: float = RECENCY_WEIGHT,
+        deadline_weight: float = DEADLINE_WEIGHT,
+    ) -> np.ndarray:
+        """
+        이벤트별 최신성 + 임박도 가산점입니다. 이미 끝난 이벤트는 -inf입니다.
+        """
+        start_ts, end_ts, received_ts = self.times[:, 0], self.times[:, 1], self.times[:, 2]
+        age_days = np.maximum(now - received_ts, 0) / SECONDS_PER_DAY
+        until_days = np.maximum(start_ts - now, 0) / SECONDS_PER_DAY
+        recency = np.nan_to_num(np.exp2(-age_days / RECENCY_HALF_LIFE_DAYS))
+        deadline = np.exp2(-until_days / DEADLINE_HALF_LIFE_DAYS)
+        scores = recency_weight * recency + deadline_weight * deadline
+        scores[end_ts < now] = -np.inf
+        return scores.astype(np.float32)
+
+    def rank_many(
+        self,
+        user_queries: dict[str, np.ndarray],
+        top_k: int = 10,
+        now: Optional[float] = None,
+        allowed_ids=None,
+        **boost_options,
+    ) -> dict[str, list[tuple[str, float]]]:
+        """
+        여러 사용자의 관심사 벡터를 한 번의 행렬곱으로 채점합니다.
+        사용자 점수는 (관심사별 cosine 중 최댓값) + 가산점이며, 점수 순 상위 top_k개의 (id, score)를 반환합니다.
+        allowed_ids가 주어지면 그 안의 이벤트만 상위 top_k 후보가 됩니다.
+        """
+        users = [user for user, queries in user_queries.items() if len(queries)]
+        result = {user: [] for user in user_queries}
+        if not users or len(self.ids) == 0:
+            return result
+
+        now = datetime.now().timestamp() if now is None else now
+        queries = [_normalize(np.atleast_2d(user_queries[user])) for user in users]
+        offsets = np.cumsum([0] + [len(q) for q in queries[:-1]])
+        similarity = self.vectors @ np.concatenate(queries).T                       # (n, 전체 관심사 수)
+        scores = np.maximum.reduceat(similarity, offsets, axis=1)                  # (n, 사용자 수)
+        scores += self.boosts(now, **boost_options)[:, None]
+        if allowed_ids is not None:
+            allowed_ids = set(allowed_ids)
+            scores[[event_id not in allowed_ids for event_id in self.ids]] = -np.inf
+
+        k = min(top_k, len(self.ids))
+        if k == 0:
+            return result
+        for column, user in enumerate(users):
+            user_scores = scores[:, column]
+            top = np.argpartition(-user_scores, k - 1)[:k]
+            top = top[np.argsort(-user_scores[top])]
+            result[user] = [(self.ids[i], float(user_scores[i])) for i in top if np.isfinite(user_scores[i])]
+        return result
+
+    def rank(self, query_vectors: np.ndarray, top_k: int = 10, now: Optional[float] = None, **boost_options):
+        return self.rank_many({"": query_vectors}, top_k=top_k, now=now, **boost_options)[""]
+
+    def save(self, directory: str = EMBEDDING_INDEX_DIRECTORY):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (("vectors.npy", self.vectors), ("times.npy", self.times)):
+            tmp_path = os.path.join(directory, name + ".tmp")
+            with open(tmp_path, "wb") as file:
+                np.save(file, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+        tmp_path = os.path.join(directory, "ids.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.ids, file)
+        os.replace(tmp_path, os.path.join(directory, "ids.json"))
+
+    @classmethod
+    def load(cls, directory: str = EMBEDDING_INDEX_DIRECTORY, mmap: bool = True) -> "EmbeddingIndex":
+        """
+        저장된 인덱스를 엽니다. 저장된 인덱스가 없으면 빈 인덱스를 반환합니다.
+        """
+        index = cls()
+        if not os.path.exists(os.path.join(directory, "ids.json")):
+            return index
+        mmap_mode = "r" if mmap else None
+        with open(os.path.join(directory, "ids.json"), "r", encoding="utf-8") as file:
+            index.ids = json.load(file)
+        index.positions = {event_id: i for i, event_id in enumerate(index.ids)}
+        index.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode)
+        index.times = np.load(os.path.join(directory, "times.npy"), mmap_mode=mmap_mode)
+        return index
+
+
+async def update_event_index(
+    store: EventStore, index: EmbeddingIndex, days: float = 30, now: Optional[datetime] = None
+) -> list[StoredEvent]:
+    """
+    앞으로 days일 안에 진행 중인(시작 전이거나 진행 중인) 이벤트 중 인덱스에 없는 것만 임베딩하여 추가합니다.
+    끝난 이벤트와, 재추출 등으로 DB에서 사라진 이벤트는 인덱스에서 제거합니다.
+
+    Returns:
+        인덱스에 있는 이벤트 리스트
+    """
+    now = now or datetime.now()
+    events = store.overlapping_events(now, now + timedelta(days=days))
+    index.prune(now.timestamp())
+    index.retain(event.event_id for event in events)
+
+    missing = [event for event in events if event.event_id not in index]
+    if missing:
+        vectors = await run_embedding([event_text(event) for event in missing])
+        index.add(
+            [event.event_id for event in missing],
+            vectors,
+            [
+                (
+                    event.start_datetime.timestamp(),
+                    (event.end_datetime or event.start_datetime).timestamp(),
+                    _to_timestamp(event.date_received),
+                )
+                for event in missing
+            ],
+        )
+    logging.info(f"[PRIORITIZE] {len(missing)} events embedded, {len(index)} in index")
+    return events
+
+
+async def embed_user_queries(user_queries: dict[str, list[str]]) -> dict[str, np.ndarray]:
+    """
+    사용자별 관심사 문장을 임베딩합니다. 여러 사용자가 같은 문장을 쓰면 한 번만 임베딩합니다.
+    """
+    texts = sorted({text for queries in user_queries.values() for text in queries})
+    if not texts:
+        return {user: np.empty((0, 0), dtype=np.float32) for user in user_queries}
+    vectors = dict(zip(texts, _normalize(await run_embedding(texts))))
+    return {user: np.array([vectors[text] for text in queries], dtype=np.float32) for user, queries in user_queries.items()}
@@ -0,0 +1,234 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from common.config.config import EVENT_STORE_PATH
+from common.types.types import Mail, StoredEvent
+
+import sqlite3, os, hashlib, time
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS mails (
+        mail_id TEXT PRIMARY KEY,
+        rowid INTEGER,
+        subject TEXT NOT NULL,
+        sender TEXT NOT NULL,
+        date_received TEXT NOT NULL,
+        body TEXT,
+        duplicate_of TEXT,
+        updated_at INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        event_id TEXT PRIMARY KEY,
+        mail_id TEXT NOT NULL REFERENCES mails(mail_id) ON DELETE CASCADE,
+        kind TEXT NOT NULL,
+        sender TEXT,
+        subject TEXT NOT NULL,
+        title TEXT NOT NULL,
+        start_datetime TEXT NOT NULL,
+        end_datetime TEXT,
+        start_ts REAL NOT NULL,
+        end_ts REAL NOT NULL,
+        location TEXT,
+        url TEXT,
+        explanation TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_start ON events(start_ts);
+    CREATE INDEX IF NOT EXISTS idx_events_location ON events(location, start_ts);
+    CREATE INDEX IF NOT EXISTS idx_events_sender ON events(sender, start_ts);
+    CREATE INDEX IF NOT EXISTS idx_events_mail ON events(mail_id);
+    CREATE INDEX IF NOT EXISTS idx_mails_sender ON mails(sender, date_received);
+"""
+
+EVENT_COLUMNS = (
+    "event_id, mail_id, kind, sender, subject, title, start_datetime, end_datetime, location, url, explanation"
+)
+
+
+def make_mail_id(mail: Mail) -> str:
+    """
+    발신자, 제목, 수신 시각으로 메일 ID를 만듭니다. (메일 소스가 달라도 같은 메일이면 같은 ID)
+    """
+    return hashlib.sha256(f"{mail.sender}\0{mail.subject}\0{mail.date_received}".encode("utf-8")).hexdigest()[:32]
+
+
+def _event_rows(mail_id: str, mail: Mail) -> list[tuple]:
+    """
+    Events를 (EVENT_COLUMNS..., start_ts, end_ts) 순서의 행으로 펼칩니다.
+    """
+    rows = []
+    for kind, events in (("offline", mail.events.offline_events), ("online", mail.events.online_events)):
+        for event in events:
+            start = event.start_datetime
+            end = event.end_datetime
+            event_id = hashlib.sha256(
+                f"{mail_id}\0{kind}\0{event.title}\0{start.isoformat()}".encode("utf-8")
+            ).hexdigest()[:32]
+            rows.append((
+                event_id,
+                mail_id,
+                kind,
+                mail.sender,
+                event.subject,
+                event.title,
+                start.isoformat(),
+                end.isoformat() if end else None,
+                getattr(event, "location", None),
+                getattr(event, "url", None),
+                event.explanation,
+                start.timestamp(),
+                # 종료 시간이 없으면 시작 시각에 끝나는 것으로 봄
+                (end or start).timestamp(),
+            ))
+    return rows
+
+
+class EventStore:
+    """
+    추출된 메일과 이벤트를 저장하는 SQLite(WAL) DB입니다.
+    - 시간 조건은 epoch 초(start_ts / end_ts) 인덱스로 조회합니다.
+      시간대가 없는 datetime은 로컬 시간으로 해석됩니다.
+    - 같은 메일을 다시 저장하면 그 메일의 이벤트는 새 추출 결과로 교체됩니다.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            db_path = EVENT_STORE_PATH
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL에서는 NORMAL로도 커밋된 데이터가 손상되지 않음 (전원 차단 시 마지막 트랜잭션만 유실 가능)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        # duplicate_of 컬럼이 생기기 전에 만든 DB
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(mails)")}
+        if "duplicate_of" not in columns:
+            self.conn.execute("ALTER TABLE mails ADD COLUMN duplicate_of TEXT")
+        self.conn.commit()
+
+    def upsert_mails(self, mails: list[Mail]) -> int:
+        """
+        메일과 이벤트를 한 트랜잭션으로 저장합니다.
+        events가 None(추출 실패)인 메일은 기존 이벤트를 그대로 둡니다.
+        duplicate_of가 있는 메일(재공지 등)은 메일만 저장하고, 이벤트는 대표 메일의 것을 사용합니다.
+
+        Returns:
+            저장한 이벤트 개수
+        """
+        now = int(time.time())
+        mail_rows, event_rows, replaced = [], [], []
+        for mail in mails:
+            mail_id = make_mail_id(mail)
+            mail_rows.append((
+                mail_id, mail.rowid, mail.subject, mail.sender, mail.date_received, mail.body, mail.duplicate_of, now
+            ))
+            if mail.duplicate_of is not None:
+                replaced.append((mail_id,))
+            elif mail.events is not None:
+                replaced.append((mail_id,))
+                event_rows.extend(_event_rows(mail_id, mail))
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO mails (mail_id, rowid, subject, sender, date_received, body, duplicate_of, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(mail_id) DO UPDATE SET
+                    rowid = COALESCE(excluded.rowid, rowid),
+                    body = COALESCE(excluded.body, body),
+                    duplicate_of = excluded.duplicate_of,
+                    updated_at = excluded.updated_at
+                """,
+                mail_rows,
+            )
+            self.conn.executemany("DELETE FROM events WHERE mail_id = ?", replaced)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO events ({EVENT_COLUMNS}, start_ts, end_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                event_rows,
+            )
+        return len(event_rows)
+
+    def _query(
+        self,
+        where: str,
+        params: list,
+        kind: Optional[str],
+        location: Optional[str],
+        sender: Optional[str],
+        limit: Optional[int],
+    ) -> list[StoredEvent]:
+        if kind is not None:
+            where += " AND e.kind = ?"
+            params.append(kind)
+        if location is not None:
+            where += " AND e.location = ?"
+            params.append(location)
+        if sender is not None:
+            where += " AND e.sender = ?"
+            params.append(sender)
+        columns = EVENT_COLUMNS.split(", ")
+        select = ", ".join(f"e.{column}" for column in columns)
+        sql = (
+            f"SELECT {select}, m.date_received FROM events e JOIN mails m ON e.mail_id = m.mail_id "
+            f"WHERE {where} ORDER BY e.start_ts"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        columns.append("date_received")
+        # NULL 컬럼은 빼고 넘겨 모델 기본값(None)을 사용
+        return [
+            StoredEvent(**{column: value for column, value in zip(columns, row) if value is not None})
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def upcoming_events(
+        self,
+        days: float = 7,
+        now: Optional[datetime] = None,
+        kind: Optional[str] = None,
+        location: Optional[str] = None,
+        sender: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[StoredEvent]:
+        """
+        지금부터 days일 안에 시작하는 이벤트를 시작 시각 순으로 반환합니다.
+        """
+        now = now or datetime.now()
+        return self._query(
+            "e.start_ts >= ? AND e.start_ts < ?",
+            [now.timestamp(), (now + timedelta(days=days)).timestamp()],
+            kind, location, sender, limit,
+        )
+
+    def overlapping_events(
+        self,
+        start: datetime,
+        end: datetime,
+        kind: Optional[str] = None,
+        location: Optional[str] = None,
+        sender: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[StoredEvent]:
+        """
+        [start, end] 구간과 겹치는 이벤트를 반환합니다. (시간표와 겹치는 일정 확인 등)
+        """
+        return self._query(
+            "e.start_ts <= ? AND e.end_ts >= ?",
+            [end.timestamp(), start.timestamp()],
+            kind, location, sender, limit,
+        )
+
+    def events_for_mail(self, mail: Mail) -> list[StoredEvent]:
+        """
+        메일의 이벤트를 반환합니다. 다른 메일의 중복으로 저장된 메일이면 대표 메일의 이벤트를 반환합니다.
+        """
+        mail_id = make_mail_id(mail)
+        return self._query(
+            "e.mail_id = COALESCE((SELECT duplicate_of FROM mails WHERE mail_id = ?), ?)",
+            [mail_id, mail_id], None, None, None, None,
+        )
+
+    def close(self):
+        self.conn.close()
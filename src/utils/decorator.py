@@ -1,5 +1,5 @@
 
-import functools, time, asyncio
+import functools, time, asyncio, random, email.utils
 
 
 def retry(max_attempts=3, delay_seconds=1, exceptions=(Exception,)):
@@ -21,7 +21,65 @@ def retry(max_attempts=3, delay_seconds=1, exceptions=(Exception,)):
     return decorator
 
 
-def retry_async(max_attempts=3, delay_seconds=1, exceptions=(Exception,)):
+def get_status_code(e: Exception):
+    """
+    API 예외에서 HTTP 상태 코드를 꺼냅니다. (openai: status_code, google-genai: code)
+    """
+    for attr in ("status_code", "code"):
+        status = getattr(e, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def parse_retry_after(value):
+    """
+    Retry-After 헤더 값(초 또는 HTTP-date)을 초 단위로 반환합니다. 읽을 수 없으면 None입니다.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def get_retry_after(e: Exception):
+    """
+    API 예외의 응답 헤더에서 Retry-After(초 또는 HTTP-date)를 읽어 초 단위로 반환합니다.
+    """
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    return parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+
+
+def is_retryable(e: Exception) -> bool:
+    """
+    재시도해도 결과가 같은 4xx 오류(잘못된 요청, 인증 실패 등)는 재시도하지 않습니다.
+    """
+    status = get_status_code(e)
+    return status is None or not (400 <= status < 500) or status in (408, 409, 429)
+
+
+def retry_async(
+    max_attempts=3,
+    delay_seconds=1,
+    exceptions=(Exception,),
+    backoff=2.0,
+    max_delay=60.0,
+    on_retry=None,
+):
+    """
+    비동기 함수를 재시도합니다.
+    - 대기 시간은 delay_seconds * backoff^(n-1) 에 jitter를 더해, 여러 요청이 한꺼번에 실패해도
+      같은 시점에 다시 몰리지 않도록 합니다(max_delay로 상한).
+    - 예외에 Retry-After 헤더가 있으면 그 시간 이상 기다립니다.
+    - on_retry(e, attempt)가 주어지면 재시도 직전에 호출됩니다. (rate limiter 조정 등)
+    """
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
@@ -31,9 +89,17 @@ def retry_async(max_attempts=3, delay_seconds=1, exceptions=(Exception,)):
                     return await func(*args, **kwargs)  # 비동기 함수 실행
                 except exceptions as e:
                     attempts += 1
-                    await asyncio.sleep(delay_seconds)  # 비동기 함수 대기
-                    if attempts == max_attempts:
+                    if attempts == max_attempts or not is_retryable(e):
                         raise
+                    if on_retry is not None:
+                        on_retry(e, attempts)
+
+                    delay = min(max_delay, delay_seconds * backoff ** (attempts - 1))
+                    delay = random.uniform(delay / 2, delay)  # jitter
+                    retry_after = get_retry_after(e)
+                    if retry_after is not None:
+                        delay = max(delay, min(retry_after, max_delay))
+                    await asyncio.sleep(delay)  # 비동기 함수 대기
 
         return wrapper
 
@@ -0,0 +1,179 @@
+from typing import Optional
+from urllib.parse import urlparse
+from common.config.config import DOWNLOAD_DIRECTORY, DOWNLOAD_MAX_CONCURRENCY, DOWNLOAD_MAX_BYTES
+from src.utils.decorator import retry_async
+from src.utils.metrics import metrics
+
+import os, asyncio, hashlib, logging, shutil
+import httpx
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    """
+    다운로드 실패. status_code가 4xx면 재시도하지 않습니다. (크기 제한 초과는 413)
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def filename_from_url(url: str, default_filename: str = "temp_downloaded.docx") -> str:
+    return os.path.basename(urlparse(url).path) or default_filename
+
+
+def _sha256_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _place(blob_path: str, file_path: str):
+    """
+    내용 저장소의 파일을 file_path에 하드 링크로 두고, 링크할 수 없으면 복사합니다.
+    """
+    if os.path.abspath(blob_path) == os.path.abspath(file_path):
+        return
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    try:
+        os.link(blob_path, file_path)
+    except OSError:
+        shutil.copyfile(blob_path, file_path)
+
+
+class AttachmentDownloader:
+    """
+    공지에 링크된 첨부파일(docx/pdf/hwp 등)을 비동기로 받습니다.
+    - 하나의 AsyncClient 커넥션 풀을 공유하고, 동시 다운로드 수는 max_concurrency로 제한합니다.
+    - 응답을 메모리에 모으지 않고 chunk 단위로 .part 파일에 쓰며, 중단된 .part는 Range 요청으로 이어 받습니다.
+    - 내용의 sha256으로 저장소(directory/objects)에 한 번만 보관하고, 같은 내용의 첨부파일은 링크로 공유합니다.
+    - 같은 URL을 동시에 요청하면 한 번만 받습니다.
+    - max_bytes를 넘는 파일은 받지 않습니다.
+    async with 블록 안에서 사용합니다.
+    """
+
+    def __init__(
+        self,
+        directory: str = DOWNLOAD_DIRECTORY,
+        max_concurrency: int = DOWNLOAD_MAX_CONCURRENCY,
+        max_bytes: int = DOWNLOAD_MAX_BYTES,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+        )
+        self._owns_client = client is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: dict[str, asyncio.Task] = {}
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "partial"), exist_ok=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._owns_client:
+            await self.client.aclose()
+
+    def _part_path(self, url: str) -> str:
+        return os.path.join(self.directory, "partial", hashlib.sha256(url.encode()).hexdigest() + ".part")
+
+    def _check_size(self, size: int, url: str):
+        if size > self.max_bytes:
+            raise DownloadError(f"File too large ({size} > {self.max_bytes} bytes): {url}", status_code=413)
+
+    @retry_async(max_attempts=3, delay_seconds=1, exceptions=(httpx.TransportError, DownloadError))
+    async def _fetch(self, url: str) -> str:
+        """
+        url을 .part 파일로 받은 뒤 내용 저장소로 옮기고, 저장소 경로를 반환합니다.
+        """
+        part_path = self._part_path(url)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416:
+                # 이미 끝까지 받은 .part
+                pass
+            elif response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code}: {url}", status_code=response.status_code)
+            else:
+                if response.status_code != 206:
+                    # 서버가 Range를 지원하지 않으면 처음부터
+                    offset = 0
+                elif offset:
+                    metrics.inc("downloads_total", status="resumed")
+                length = response.headers.get("Content-Length")
+                if length is not None:
+                    self._check_size(offset + int(length), url)
+
+                written = offset
+                with open(part_path, "ab" if offset else "wb") as file:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        written += len(chunk)
+                        if written > self.max_bytes:
+                            file.close()
+                            os.remove(part_path)
+                            self._check_size(written, url)
+                        file.write(chunk)
+
+        # .part 전체의 해시 (이어 받은 경우 앞부분 포함). 큰 파일도 이벤트 루프를 막지 않도록 스레드에서 계산
+        digest = await asyncio.to_thread(_sha256_file, part_path)
+        ext = os.path.splitext(filename_from_url(url, ""))[1]
+        blob_path = os.path.join(self.directory, "objects", digest + ext)
+
+        if os.path.exists(blob_path):
+            os.remove(part_path)
+            metrics.inc("downloads_total", status="deduplicated")
+        else:
+            os.replace(part_path, blob_path)
+            metrics.inc("downloads_total", status="downloaded")
+            metrics.inc("downloaded_bytes_total", os.path.getsize(blob_path))
+        return blob_path
+
+    async def _fetch_limited(self, url: str) -> str:
+        async with self._semaphore:
+            return await self._fetch(url)
+
+    async def download(
+        self, url: str, save_dir: Optional[str] = None, default_filename: str = "temp_downloaded.docx"
+    ) -> str:
+        """
+        url의 파일을 받아 save_dir/<URL의 파일명>에 두고 경로를 반환합니다.
+        save_dir가 None이면 내용 저장소의 경로를, 빈 문자열이면 현재 디렉토리의 파일명을 반환합니다.
+        """
+        task = self._inflight.get(url)
+        if task is None:
+            task = self._inflight[url] = asyncio.ensure_future(self._fetch_limited(url))
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        blob_path = await asyncio.shield(task)
+
+        if save_dir is None:
+            return blob_path
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+        file_path = os.path.join(save_dir, filename_from_url(url, default_filename))
+        _place(blob_path, file_path)
+        return file_path
+
+    async def download_many(self, urls: list[str], save_dir: Optional[str] = None) -> list:
+        """
+        여러 파일을 동시에 받습니다. 실패한 항목은 경로 대신 예외를 반환합니다.
+        """
+        results = await asyncio.gather(*(self.download(url, save_dir) for url in urls), return_exceptions=True)
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logging.warning(f"[DOWNLOAD] Failed {url}: {result}")
+        return results
@@ -0,0 +1,200 @@
+from contextlib import contextmanager
+from common.config.config import LLM_PRICING, USD_TO_KRW
+
+import bisect, json, os, threading, time
+
+# 초 단위 latency 히스토그램 버킷
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """
+    모델별 단가(USD / 1M tokens)로 요청 비용을 USD 단위로 계산합니다. 단가가 없는 모델은 0입니다.
+    """
+    input_price, output_price = LLM_PRICING.get(model, (0.0, 0.0))
+    return input_tokens / 1_000_000 * input_price + output_tokens / 1_000_000 * output_price
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        버킷 경계 기준의 근사 분위수를 반환합니다.
+        """
+        if self.count == 0:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class Metrics:
+    """
+    파이프라인 전체에서 공유하는 간단한 메트릭 저장소입니다.
+    counter / gauge / histogram을 label 별로 기록하고, Prometheus 텍스트나 JSON 리포트로 내보냅니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.gauges = {}
+            self.gauge_max = {}
+            self.histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+            self.gauge_max[key] = max(self.gauge_max.get(key, 0), self.gauges[key])
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        with 블록의 실행 시간을 pipeline_stage_seconds{stage=...}에 기록합니다.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("pipeline_stage_seconds", time.perf_counter() - start_time, stage=stage)
+
+    @contextmanager
+    def in_flight(self, name: str, **labels):
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    def record_llm_request(self, provider: str, model: str, latency: float, input_tokens: int, output_tokens: int):
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        self.observe("llm_request_seconds", latency, provider=provider)
+        self.inc("llm_requests_total", provider=provider, status="ok")
+        self.inc("llm_input_tokens_total", input_tokens, provider=provider)
+        self.inc("llm_output_tokens_total", output_tokens, provider=provider)
+        self.inc("llm_cost_usd_total", cost, provider=provider)
+        return cost
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            lines = []
+            for (name, key), value in sorted(self.counters.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), value in sorted(self.gauges.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+                lines.append(f"{name}_max{_format_labels(key)} {self.gauge_max[(name, key)]}")
+            for (name, key), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+            return "\n".join(lines) + "\n"
+
+    def report(self) -> dict:
+        """
+        실행 단위 요약 리포트를 만듭니다.
+        """
+        with self._lock:
+            def labeled(key):
+                return dict(key) or None
+
+            counters = [
+                {"name": name, "labels": labeled(key), "value": value}
+                for (name, key), value in sorted(self.counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": labeled(key), "value": value, "max": self.gauge_max[(name, key)]}
+                for (name, key), value in sorted(self.gauges.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": labeled(key),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "max": histogram.max,
+                }
+                for (name, key), histogram in sorted(self.histograms.items())
+            ]
+
+            hits = sum(v for (n, k), v in self.counters.items() if n == "extraction_cache_requests_total" and dict(k).get("result") == "hit")
+            lookups = sum(v for (n, k), v in self.counters.items() if n == "extraction_cache_requests_total")
+            cost_usd = sum(v for (n, k), v in self.counters.items() if n == "llm_cost_usd_total")
+
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": time.time() - self.started_at,
+                "cache_hit_rate": hits / lookups if lookups else None,
+                "cost_usd": cost_usd,
+                "cost_krw": cost_usd * USD_TO_KRW,
+                "counters": counters,
+                "gauges": gauges,
+                "histograms": histograms,
+            }
+
+    def write_report(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str):
+        """
+        node_exporter textfile collector 등에서 읽을 수 있도록 Prometheus 텍스트 형식으로 저장합니다.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
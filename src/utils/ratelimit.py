@@ -0,0 +1,134 @@
+from typing import Optional
+
+import asyncio, time, logging
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    요청 전 토큰 수를 대략적으로 추정합니다.
+    한글이 섞인 공지 기준으로 2글자당 1토큰 정도로 보수적으로 계산합니다.
+    """
+    return len(text) // 2 + 1
+
+
+class TokenBucket:
+    """
+    분당 rate_per_minute만큼 채워지는 토큰 버킷입니다.
+    - acquire()는 토큰을 먼저 차감(예약)하고 부족한 만큼만 기다리므로, 여러 요청이 동시에
+      기다려도 순서대로 일정한 간격으로 풀려납니다.
+    - 429를 받으면 penalize()로 속도를 절반으로 줄이고, 성공할 때마다 reward()로 조금씩 회복합니다.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        self._refill()
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """
+        예약한 양과 실제 사용량의 차이를 반영합니다. (양수면 추가 차감, 음수면 환불)
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def penalize(self):
+        self._refill()
+        self.rate = max(self.max_rate * 0.1, self.rate * 0.5)
+
+    def reward(self):
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """
+    provider별 분당 요청 수(RPM)와 분당 토큰 수(TPM) 제한을 함께 적용합니다.
+    값이 None이면 해당 제한은 적용하지 않습니다.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int = 0):
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        if self.tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def penalize(self):
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.penalize()
+
+    def reward(self):
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.reward()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold번 이상이면 reset_timeout초 동안 요청을 바로 거절(open)합니다.
+    이후 한 번의 시험 요청(half-open)이 성공하면 다시 정상(closed) 상태로 돌아갑니다.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
+
+    def before_request(self) -> bool:
+        """
+        요청을 보내도 되는지 확인합니다. 이 요청이 half-open 시험 요청이면 True를 반환합니다.
+        """
+        if self.opened_at is None:
+            return False
+        if self.half_open or time.monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+        # reset_timeout이 지나면 시험 요청 하나만 통과시킴
+        self.half_open = True
+        return True
+
+    def release_trial(self):
+        """
+        시험 요청이 성공/실패 판정 없이 끝난 경우(취소, 응답 검증 실패 등) 다음 요청이 다시 시험할 수 있게 합니다.
+        """
+        self.half_open = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.half_open or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.half_open:
+                logging.warning(f"[CIRCUIT] {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            self.half_open = False
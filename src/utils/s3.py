@@ -0,0 +1,422 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from tqdm import tqdm
+from common.config.config import (
+    S3_ENDPOINT_URL,
+    S3_UPLOAD_MAX_WORKERS,
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_MANIFEST_DIRECTORY,
+    S3_MANIFEST_MAX_AGE,
+    S3_PRESIGN_EXPIRATION,
+    S3_PRESIGN_REUSE_RATIO,
+)
+from common.types.types import UploadReport
+from src.utils.metrics import metrics
+
+import os, time, json, hashlib, logging, threading
+import boto3
+
+# 업로드 상태
+UPLOADED = "uploaded"
+SKIPPED = "skipped"
+
+# 한 파일의 multipart part를 동시에 올리는 스레드 수
+PART_CONCURRENCY = 4
+
+
+def make_s3_client(
+    access_key: str,
+    secret_key: str,
+    region_name: str,
+    endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+    max_pool_connections: int = S3_UPLOAD_MAX_WORKERS * PART_CONCURRENCY,
+):
+    """
+    S3 클라이언트를 만듭니다. 클라이언트는 스레드 간에 공유할 수 있으므로,
+    동시에 사용할 스레드 수만큼 커넥션 풀을 잡습니다.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region_name,
+        endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=max_pool_connections, retries={"mode": "adaptive", "max_attempts": 5}),
+    )
+
+
+_clients: dict = {}
+_presigners: dict = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(
+    access_key: Optional[str] = None,
+    secret_key: Optional[str] = None,
+    region_name: Optional[str] = None,
+    endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+):
+    """
+    (자격 증명, 리전, 엔드포인트)마다 하나의 클라이언트를 만들어 재사용합니다.
+    클라이언트 생성(자격 증명 확인, 엔드포인트 정보 로딩)은 느리고, 재사용해야 커넥션 풀도 유지됩니다.
+    access_key가 None이면 boto3 기본 자격 증명(환경변수, ~/.aws 등)을 사용합니다.
+    """
+    key = (access_key, secret_key, region_name, endpoint_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = make_s3_client(access_key, secret_key, region_name, endpoint_url)
+        return client
+
+
+class S3Presigner:
+    """
+    여러 객체의 Presigned URL을 한 클라이언트로 만들고, 유효 시간이 충분히 남은 URL은 메모리에서 재사용합니다.
+    """
+
+    def __init__(self, s3, reuse_ratio: float = S3_PRESIGN_REUSE_RATIO):
+        self.s3 = s3
+        self.reuse_ratio = reuse_ratio
+        self._urls: dict[tuple[str, str], tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def presign_many(self, bucket_name: str, keys: list[str], expiration: int = S3_PRESIGN_EXPIRATION) -> dict[str, str]:
+        """
+        {key: url}을 반환합니다. 캐시된 URL의 남은 유효 시간이 expiration * reuse_ratio 이상이면 재사용합니다.
+        """
+        now = time.time()
+        urls, missing = {}, []
+        with self._lock:
+            for key in keys:
+                cached = self._urls.get((bucket_name, key))
+                if cached is not None and cached[1] - now >= expiration * self.reuse_ratio:
+                    urls[key] = cached[0]
+                else:
+                    missing.append(key)
+
+        # 서명은 로컬 계산이므로 네트워크 요청 없이 클라이언트 하나로 처리
+        signed = {
+            key: self.s3.generate_presigned_url(
+                ClientMethod="get_object", Params={"Bucket": bucket_name, "Key": key}, ExpiresIn=expiration
+            )
+            for key in dict.fromkeys(missing)
+        }
+        with self._lock:
+            for key, url in signed.items():
+                self._urls[(bucket_name, key)] = (url, now + expiration)
+            # 만료된 URL 정리
+            if len(self._urls) > 2 * len(signed) + 1024:
+                self._urls = {k: v for k, v in self._urls.items() if v[1] > now}
+        metrics.inc("s3_presigned_urls_total", len(urls), status="cached")
+        metrics.inc("s3_presigned_urls_total", len(signed), status="signed")
+        urls.update(signed)
+        return urls
+
+    def presign(self, bucket_name: str, key: str, expiration: int = S3_PRESIGN_EXPIRATION) -> str:
+        return self.presign_many(bucket_name, [key], expiration)[key]
+
+
+def get_s3_presigner(
+    access_key: Optional[str] = None,
+    secret_key: Optional[str] = None,
+    region_name: Optional[str] = None,
+    endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+) -> S3Presigner:
+    """
+    get_s3_client와 같은 키로 S3Presigner를 재사용합니다. (URL 캐시도 함께 공유)
+    """
+    client = get_s3_client(access_key, secret_key, region_name, endpoint_url)
+    key = (access_key, secret_key, region_name, endpoint_url)
+    with _clients_lock:
+        presigner = _presigners.get(key)
+        if presigner is None:
+            presigner = _presigners[key] = S3Presigner(client)
+        return presigner
+
+
+def _open_source(file):
+    """
+    파일 경로 또는 name 속성이 있는 파일 객체(예: 업로드된 파일)를 (이름, 파일 객체, 크기, 직접 연 파일인지)로 만듭니다.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        fileobj = open(file, "rb")
+        return os.path.basename(file), fileobj, os.fstat(fileobj.fileno()).st_size, True
+    fileobj = file
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return os.path.basename(file.name), fileobj, size, False
+
+
+def compute_etag(fileobj, size: int, threshold: int = S3_MULTIPART_THRESHOLD, chunksize: int = S3_MULTIPART_CHUNKSIZE) -> str:
+    """
+    같은 설정으로 업로드했을 때 S3가 돌려줄 ETag를 계산합니다.
+    단일 업로드는 내용의 MD5, multipart 업로드는 part별 MD5를 이어 붙인 값의 MD5 + "-part 수" 입니다.
+    """
+    fileobj.seek(0)
+    try:
+        if size < threshold:
+            hasher = hashlib.md5()
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+                hasher.update(chunk)
+            return hasher.hexdigest()
+        digests = [hashlib.md5(chunk).digest() for chunk in iter(lambda: fileobj.read(chunksize), b"")]
+        return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+    finally:
+        fileobj.seek(0)
+
+
+def _remote_object(s3, bucket_name: str, key: str) -> Optional[dict]:
+    try:
+        return s3.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def iter_s3_objects(s3, bucket_name: str, prefix: str = "", delimiter: Optional[str] = None):
+    """
+    list_objects_v2를 페이지 단위로 끝까지 읽어 객체 정보를 반환합니다. (1000개 제한 없음)
+    delimiter가 주어지면 하위 prefix(CommonPrefixes)도 {"Prefix": ...} 형태로 함께 반환합니다.
+    """
+    kwargs = {"Bucket": bucket_name, "Prefix": prefix}
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+    for page in s3.get_paginator("list_objects_v2").paginate(**kwargs):
+        yield from page.get("CommonPrefixes", [])
+        yield from page.get("Contents", [])
+
+
+def _object_entry(obj: dict) -> list:
+    return [obj["Size"], obj["ETag"].strip('"'), obj["LastModified"].timestamp()]
+
+
+def _list_top_level(s3, bucket_name: str, prefix: str) -> tuple[dict, list[str]]:
+    """
+    prefix 바로 아래의 객체({key: entry})와 하위 prefix 목록을 반환합니다.
+    """
+    direct, shards = {}, []
+    for item in iter_s3_objects(s3, bucket_name, prefix, delimiter="/"):
+        if "Prefix" in item:
+            shards.append(item["Prefix"])
+        else:
+            direct[item["Key"]] = _object_entry(item)
+    return direct, shards
+
+
+def _list_shards(s3, bucket_name: str, shards: list[str], max_workers: int):
+    """
+    하위 prefix마다 전체 목록을 병렬로 조회하여 (shard, {key: entry})를 반환합니다.
+    """
+    def list_shard(shard):
+        return shard, {obj["Key"]: _object_entry(obj) for obj in iter_s3_objects(s3, bucket_name, shard)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(list_shard, shards)
+
+
+def list_s3_keys(s3, bucket_name: str, prefix: str = "", max_workers: int = S3_UPLOAD_MAX_WORKERS) -> list[str]:
+    """
+    prefix 아래의 모든 key를 반환합니다. 하위 prefix별로 나누어 병렬로 조회합니다.
+    """
+    direct, shards = _list_top_level(s3, bucket_name, prefix)
+    keys = list(direct)
+    for _, objects in _list_shards(s3, bucket_name, shards, max_workers):
+        keys.extend(objects)
+    return sorted(keys)
+
+
+class S3Manifest:
+    """
+    버킷 객체 목록(key -> [size, etag, mtime])을 로컬 JSON 파일에 보관합니다.
+    - refresh()는 prefix 바로 아래의 하위 prefix(shard)마다 목록을 병렬로 조회하며,
+      prefix 바로 아래 목록을 포함해 max_age보다 오래된 shard만 다시 조회합니다.
+    - upload_files에 manifest를 넘기면 업로드한 객체가 바로 반영되어, 다음 실행에서 버킷 전체를 다시 읽지 않아도 됩니다.
+    - diff()는 로컬 파일 중 올려야 할 것을 메모리에서 바로 계산합니다.
+    """
+
+    def __init__(self, bucket_name: str, prefix: str = "", path: Optional[str] = None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.path = path or os.path.join(
+            S3_MANIFEST_DIRECTORY, f"{bucket_name}-{hashlib.sha256(prefix.encode()).hexdigest()[:8]}.json"
+        )
+        self.objects: dict[str, list] = {}
+        self.shards: dict[str, float] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            self.objects, self.shards = state["objects"], state["shards"]
+
+    def __contains__(self, key: str):
+        return key in self.objects
+
+    def get(self, key: str) -> Optional[list]:
+        return self.objects.get(key)
+
+    def record(self, key: str, size: int, etag: str):
+        with self._lock:
+            self.objects[key] = [size, etag, time.time()]
+
+    def _replace_shard(self, shard: str, objects: dict, direct: bool):
+        """
+        shard 아래의 기존 항목을 새 목록으로 교체합니다. direct면 shard 바로 아래의 객체만 교체합니다.
+        """
+        def in_shard(key):
+            return key.startswith(shard) and (not direct or "/" not in key[len(shard):])
+
+        with self._lock:
+            self.objects = {key: entry for key, entry in self.objects.items() if not in_shard(key)}
+            self.objects.update(objects)
+            self.shards[shard] = time.time()
+
+    def refresh(self, s3, max_age: float = S3_MANIFEST_MAX_AGE, max_workers: int = S3_UPLOAD_MAX_WORKERS) -> int:
+        """
+        prefix 바로 아래 목록(하위 prefix 포함)도 max_age보다 오래됐을 때만 다시 조회하고,
+        그 사이에는 마지막으로 조회한 하위 prefix 목록과 업로드로 기록된 항목을 그대로 사용합니다.
+        그 다음 오래된 하위 prefix만 병렬로 다시 조회합니다. 다시 조회한 shard 수를 반환합니다.
+        """
+        now = time.time()
+        if now - self.shards.get(self.prefix, 0) > max_age:
+            direct, shards = _list_top_level(s3, self.bucket_name, self.prefix)
+            self._replace_shard(self.prefix, direct, direct=True)
+
+            # 버킷에서 사라진 shard의 항목 제거
+            gone = [shard for shard in self.shards if shard != self.prefix and shard not in shards]
+            for shard in gone:
+                self._replace_shard(shard, {}, direct=False)
+                del self.shards[shard]
+        else:
+            shards = [shard for shard in self.shards if shard != self.prefix]
+
+        stale = [shard for shard in shards if now - self.shards.get(shard, 0) > max_age]
+        for shard, objects in _list_shards(s3, self.bucket_name, stale, max_workers):
+            self._replace_shard(shard, objects, direct=False)
+
+        self.save()
+        logging.info(f"[S3] manifest {self.bucket_name}/{self.prefix}: {len(self.objects)} objects, {len(stale)}/{len(shards)} shards refreshed")
+        return len(stale)
+
+    def diff(self, files: dict[str, int]) -> list[str]:
+        """
+        {key: size} 중 manifest에 없거나 크기가 다른 key를 반환합니다.
+        """
+        return [key for key, size in files.items() if self.objects.get(key, [None])[0] != size]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"objects": self.objects, "shards": self.shards}, file)
+        os.replace(tmp_path, self.path)
+
+
+def _upload_one(
+    s3,
+    file,
+    bucket_name: str,
+    prefix: str,
+    transfer_config: TransferConfig,
+    skip_existing: bool,
+    manifest: Optional[S3Manifest] = None,
+):
+    name, fileobj, size, opened = _open_source(file)
+    key = f"{prefix.rstrip('/')}/{name}" if prefix else name
+    try:
+        etag = None
+        if skip_existing:
+            # manifest가 있으면 HEAD 요청 없이 로컬 목록으로 비교
+            if manifest is not None:
+                entry = manifest.get(key)
+                remote_size, remote_etag = (entry[0], entry[1]) if entry else (None, None)
+            else:
+                remote = _remote_object(s3, bucket_name, key)
+                remote_size, remote_etag = (remote["ContentLength"], remote["ETag"].strip('"')) if remote else (None, None)
+            # 크기가 같을 때만 ETag를 계산하여 비교 (대부분은 크기에서 걸러짐)
+            if remote_size == size:
+                etag = compute_etag(fileobj, size, transfer_config.multipart_threshold, transfer_config.multipart_chunksize)
+                if remote_etag == etag:
+                    return key, SKIPPED, 0
+
+        # upload_fileobj가 파일을 닫을 수 있으므로 manifest에 기록할 ETag는 업로드 전에 계산
+        if manifest is not None and etag is None:
+            etag = compute_etag(fileobj, size, transfer_config.multipart_threshold, transfer_config.multipart_chunksize)
+
+        # 파일 전체를 메모리에 올리지 않고 스트리밍, 큰 파일은 multipart로 part를 병렬 업로드
+        s3.upload_fileobj(fileobj, bucket_name, key, Config=transfer_config)
+        if manifest is not None:
+            manifest.record(key, size, etag)
+        return key, UPLOADED, size
+    finally:
+        if opened:
+            fileobj.close()
+
+
+def upload_files(
+    files: list,
+    bucket_name: str,
+    s3,
+    prefix: str = "",
+    max_workers: int = S3_UPLOAD_MAX_WORKERS,
+    skip_existing: bool = True,
+    multipart_threshold: int = S3_MULTIPART_THRESHOLD,
+    multipart_chunksize: int = S3_MULTIPART_CHUNKSIZE,
+    manifest: Optional[S3Manifest] = None,
+) -> UploadReport:
+    """
+    여러 파일을 하나의 S3 클라이언트를 공유하는 스레드 풀에서 동시에 업로드합니다.
+    - files: 파일 경로 또는 name 속성이 있는 파일 객체 리스트
+    - skip_existing이 True면 크기와 ETag가 같은 객체는 건너뜁니다.
+      manifest가 주어지면 객체마다 HEAD를 보내지 않고 manifest로 비교하며, 업로드 결과를 manifest에 저장합니다.
+    - 업로드 개수, 바이트 수, 처리량을 담은 UploadReport를 반환합니다.
+    """
+    transfer_config = TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=PART_CONCURRENCY,
+    )
+    report = UploadReport()
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, tqdm(
+        total=len(files), desc="파일 업로드 중", unit="개"
+    ) as pbar:
+        futures = {
+            executor.submit(_upload_one, s3, file, bucket_name, prefix, transfer_config, skip_existing, manifest): file
+            for file in files
+        }
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                key, status, size = future.result()
+                if status == SKIPPED:
+                    report.skipped += 1
+                else:
+                    report.uploaded += 1
+                    report.uploaded_bytes += size
+                    metrics.inc("s3_uploaded_bytes_total", size)
+                metrics.inc("s3_uploads_total", status=status)
+                pbar.set_postfix({"File": key, "Status": status})
+            except (ClientError, BotoCoreError, OSError) as e:
+                name = getattr(file, "name", file)
+                report.failed.append(str(name))
+                metrics.inc("s3_uploads_total", status="failed")
+                pbar.write(f"업로드 실패: {name}, 에러: {e}")
+            pbar.update(1)
+
+    if manifest is not None:
+        manifest.save()
+    report.elapsed_seconds = time.perf_counter() - start_time
+    metrics.observe("pipeline_stage_seconds", report.elapsed_seconds, stage="upload")
+    logging.info(
+        f"[S3] uploaded {report.uploaded}, skipped {report.skipped}, failed {len(report.failed)} / "
+        f"{report.uploaded_bytes / (1024 * 1024):.1f}MB in {report.elapsed_seconds:.1f}s "
+        f"({report.throughput_mb_per_second:.2f}MB/s)"
+    )
+    return report
@@ -1,60 +1,53 @@
-from urllib.parse import urlparse
 from typing import Optional
 from botocore.exceptions import ClientError
-from tqdm import tqdm
 from common.types.types import Mail
+from src.utils.download import AttachmentDownloader, DownloadError
+from src.utils.s3 import get_s3_client, get_s3_presigner, upload_files, list_s3_keys, S3Manifest
 
-import os, requests, asyncio, boto3
+import asyncio
+import httpx
 
 
 
 def parse_mail(mail_data: tuple) -> Mail:
     """
-    Apple Mail의 SQLite 데이터베이스에서 가져온 메일 데이터를 Mail 타입으로 변환합니다.
+    Apple Mail의 SQLite 데이터베이스(또는 같은 행 형식의 Graph 소스)에서 가져온 메일 데이터를 Mail 타입으로 변환합니다.
+    Graph 메일처럼 ROWID가 없는 행은 rowid를 비워 둡니다.
     """
-    subject, summary, sender, date_received = mail_data
+    subject, summary, sender, date_received, rowid = mail_data
 
-    mail = Mail(
+    return Mail(
         subject=subject,
         summary=summary,
         sender=sender,
-        date_received=date_received
+        date_received=date_received,
+        rowid=rowid,
     )
-    return mail
 
 
 
 def download_file(url: str, save_dir: Optional[str] = None, default_filename: str = "temp_downloaded.docx") -> str:
     """
     URL에서 파일을 다운로드하여 저장하고 저장된 파일의 경로를 반환합니다.
+    스트리밍·이어 받기·크기 제한·내용 중복 제거는 src.utils.download.AttachmentDownloader 참고.
+    여러 파일을 받을 때는 AttachmentDownloader.download_many를 사용하세요.
+    내부에서 asyncio.run을 호출하므로 이벤트 루프 밖(동기 코드)에서만 사용할 수 있습니다.
+    비동기 코드에서는 AttachmentDownloader.download를 await 하세요.
     """
     try:
-        # 1. URL에서 파일 다운로드
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-
-        # 2. URL에서 파일명 추출
-        parsed_url = urlparse(url)
-        filename = os.path.basename(parsed_url.path)
-        
-        # 파일명이 없으면 기본 파일명 사용
-        if not filename:
-            filename = default_filename
-
-        # 3. 저장 디렉토리 설정
-        if save_dir:
-            os.makedirs(save_dir, exist_ok=True)
-            file_path = os.path.join(save_dir, filename)
-        else:
-            file_path = filename
-
-        # 4. 파일 저장
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-
-        return file_path
-
-    except requests.exceptions.RequestException as e:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("download_file은 실행 중인 이벤트 루프 안에서 호출할 수 없습니다. AttachmentDownloader.download를 await 하세요.")
+
+    async def _download():
+        async with AttachmentDownloader() as downloader:
+            return await downloader.download(url, save_dir or "", default_filename)
+
+    try:
+        return asyncio.run(_download())
+    except (httpx.HTTPError, DownloadError) as e:
         raise Exception(f"파일 다운로드 실패: {str(e)}")
     except OSError as e:
         raise Exception(f"파일 저장 실패: {str(e)}")
@@ -75,83 +68,49 @@ async def async_wrapper(tasks: list) -> list:
 
 
 
-def upload_s3(files:list, access_key:str, secret_key:str, region_name:str, bucket_name:str, prefix:str=""):
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region_name
-    )
+async def aiter_items(items):
+    """
+    일반 iterable과 async iterable을 모두 async iterator로 순회할 수 있게 합니다.
+    """
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
 
-    # 전체 파일 개수 기준으로 tqdm Progress Bar 생성
-    with tqdm(total=len(files), desc="파일 업로드 중", unit="개") as pbar:
-        for file in files:
-            # prefix가 있으면 파일명 앞에 추가
-            file_key = os.path.join(prefix, file.name) if prefix else file.name
-            file_bytes = file.read()
-            file_size_mb = len(file_bytes) / (1024 * 1024)  # MB 단위 크기
-
-            try:
-                s3.put_object(
-                    Bucket=bucket_name,
-                    Key=file_key,
-                    Body=file_bytes
-                )
-                # 업로드 후, tqdm에 파일명과 크기 정보를 Postfix로 표시
-                pbar.set_postfix({
-                    "File": file_key,
-                    "Size(MB)": f"{file_size_mb:.2f}"
-                })
-            except ClientError as e:
-                pbar.write(f"업로드 실패: {file_key}, 에러: {e}")
-
-            # 한 파일 처리 완료 후 1만큼 업데이트
-            pbar.update(1)
+
+def upload_s3(files:list, access_key:str, secret_key:str, region_name:str, bucket_name:str, prefix:str=""):
+    """
+    파일들을 S3에 동시에 업로드합니다. 이미 같은 내용(크기, ETag)이 있는 객체는 건너뜁니다.
+    기존 객체 비교는 로컬 manifest(src.utils.s3.S3Manifest)로 하므로 파일마다 HEAD 요청을 보내지 않습니다.
+    자세한 동작은 src.utils.s3.upload_files 참고.
+    """
+    s3 = get_s3_client(access_key, secret_key, region_name)
+    manifest = S3Manifest(bucket_name, prefix)
+    manifest.refresh(s3)
+    return upload_files(files, bucket_name, s3, prefix=prefix, manifest=manifest)
 
 def list_s3_objects(bucket_name:str, region_name:str, access_key:str, secret_key:str, prefix:str=None) -> list:
     """
     S3 버킷 내 특정 prefix(폴더) 경로의 파일(Key) 목록을 반환.
     prefix가 None이면, 버킷 전체 목록을 반환.
+    1000개가 넘어도 페이지를 끝까지 읽으며, 하위 prefix별로 병렬 조회합니다.
     """
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region_name
-    )
-
-    existing_files = []
-    # prefix가 None 또는 빈 문자열이면 전체 목록
-    list_kwargs = {"Bucket": bucket_name}
-    if prefix:
-        list_kwargs["Prefix"] = prefix
-
-    response = s3.list_objects_v2(**list_kwargs)
-    if "Contents" in response:
-        existing_files = [obj["Key"] for obj in response["Contents"]]
-    
-    return existing_files
+    s3 = get_s3_client(access_key, secret_key, region_name)
+    return list_s3_keys(s3, bucket_name, prefix or "")
 
 
 
 def generate_presigned_url(bucket_name, region_name, access_key, secret_key, file_key, expiration=36000):
     """
     S3 객체에 접근할 수 있는 Presigned URL을 생성하여 반환합니다.
-    expiration(초 단위) 동안 유효합니다 (기본: 3600초 = 1시간).
+    expiration(초 단위) 동안 유효합니다 (기본: 36000초 = 10시간).
+    같은 자격 증명의 클라이언트와, 유효 시간이 충분히 남은 URL은 재사용합니다. (src.utils.s3.S3Presigner)
     """
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region_name
-    )
+    presigner = get_s3_presigner(access_key, secret_key, region_name)
     try:
-        url = s3.generate_presigned_url(
-            ClientMethod='get_object',
-            Params={'Bucket': bucket_name, 'Key': file_key},
-            ExpiresIn=expiration
-        )
-        return url
+        return presigner.presign(bucket_name, file_key, expiration)
     except ClientError as e:
         print(f"Presigned URL 생성 실패: {e}")
-        return None
\ No newline at end of file
+        return None